@@ -0,0 +1,249 @@
+"""Benchmarks replaying the simulation on synthetic test cases
+
+Starting from BASE, each parameter in SWEEP is varied on its own (everything else stays at BASE), a random test case
+is generated for every value with trace_generator, and each algorithm replays it through test_simulation. Algorithms
+without a reference (anything given with --algorithm) have no expected rounds to check against, so they only run the
+simulation, without test_simulation's checks. For every run this records rounds/sec and peak memory, and for every
+parameter how time grows with it (the exponent k in time ~ value^k, so ~1 is linear and ~2 is quadratic).
+
+    python benchmark.py run -o before.json
+    python benchmark.py run -o after.json --algorithm my_algorithms:MyAlgorithm
+    python benchmark.py compare before.json after.json
+
+compare exits with 1 if anything got slower (or used more memory) by more than --threshold.
+"""
+
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import headless
+headless.install_null_pygame()
+
+from a1_algorithms import EndToEndLoop, FurthestFloor
+from a1_simulation import Simulation
+
+from test_case_tester import TestCaseGenerator, run_sim, test_simulation
+from trace_generator import REFERENCE_ALGORITHMS, generate_trace
+from trace_io import TestCaseReader, write_test_case
+
+BASE = {
+    "num_floors": 10,
+    "num_elevators": 2,
+    "elevator_capacity": 4,
+    "max_arrivals": 2,
+    "num_rounds": 500,
+}
+
+SWEEP = {
+    "num_floors": [5, 10, 20, 40],
+    "num_elevators": [1, 2, 4, 8],
+    "elevator_capacity": [1, 4, 16],
+    "max_arrivals": [1, 2, 4, 8],
+    "num_rounds": [250, 500, 1000, 2000],
+}
+
+ALGORITHMS = {
+    "FurthestFloor": FurthestFloor,
+    "EndToEndLoop": EndToEndLoop,
+}
+
+
+def load_algorithm(spec):
+    """Returns the algorithm class for "module:Class" (or one of the built in names)"""
+    if spec in ALGORITHMS:
+        return ALGORITHMS[spec]
+
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _write_case(folder, config, algorithm, seed) -> str:
+    # The expected rounds come from the reference algorithm if there is one, otherwise the case is only for timing
+    reference = algorithm if algorithm in REFERENCE_ALGORITHMS else "FurthestFloor"
+    path = os.path.join(folder, f"{reference}_{'_'.join(str(i) for i in config.values())}.json")
+
+    if not os.path.exists(path):
+        write_test_case(generate_trace(config["num_floors"], config["num_elevators"], config["elevator_capacity"],
+                                       seed, config["num_rounds"], reference, config["max_arrivals"]), path)
+    return path
+
+
+def simulate(path, moving_algorithm) -> None:
+    """Runs the simulation through every round of path without checking anything, for algorithms the test case
+    wasn't made with (checking those would mostly time recording the diffs)"""
+    with TestCaseReader(path) as reader:
+        gen = TestCaseGenerator()
+
+        config = dict(reader.config)
+        config["arrival_generator"] = gen
+        config["moving_algorithm"] = moving_algorithm
+        config["visualize"] = False
+
+        s = Simulation(config)
+        for rn, arrivals, _ in reader:
+            gen.feed(rn, arrivals)
+            run_sim(s, rn)
+
+
+def measure(path, algorithm_cls, num_rounds, repeat=3, check=True) -> dict:
+    """Replays path with a fresh algorithm_cls() repeat times, returns the best time and the peak memory. Without
+    check, the simulation is only run (see simulate) and passed is None"""
+    def replay():
+        if check:
+            return test_simulation(path, algorithm_cls(), fail_fast=False).passed
+        simulate(path, algorithm_cls())
+        return None
+
+    best = math.inf
+    passed = True if check else None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ok = replay()
+        best = min(best, time.perf_counter() - start)
+        passed = passed and ok
+
+    # Memory is measured on its own run since tracemalloc slows everything down
+    tracemalloc.start()
+    replay()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "rounds_per_sec": num_rounds / best if best else math.inf,
+        "peak_mb": peak / 2 ** 20,
+        "passed": passed,
+    }
+
+
+def scaling_exponent(points) -> float | None:
+    """Least squares slope of log(seconds) against log(value)"""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else None
+
+
+def run(algorithms, base=None, sweep=None, seed=0, repeat=3) -> dict:
+    base = base or BASE
+    sweep = sweep or SWEEP
+
+    results = []
+    scaling = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        for axis, values in sweep.items():
+            for name in algorithms:
+                algorithm_cls = load_algorithm(name)
+                points = []
+
+                for value in values:
+                    config = dict(base, **{axis: value})
+                    path = _write_case(folder, config, name, seed)
+
+                    m = measure(path, algorithm_cls, config["num_rounds"], repeat, check=name in REFERENCE_ALGORITHMS)
+                    results.append({"axis": axis, "value": value, "algorithm": name, "config": config, **m})
+                    points.append((value, m["seconds"]))
+
+                    print(f"{name:<16}{axis:<20}{value:>8}{m['rounds_per_sec']:>14.1f} rounds/s{m['peak_mb']:>10.2f} MB"
+                          + ("  (didn't match the reference)" if m["passed"] is False else ""))
+
+                scaling.setdefault(name, {})[axis] = scaling_exponent(points)
+
+    print()
+    for name, axes in scaling.items():
+        print(f"{name}: " + ", ".join(f"{axis} ^{k:.2f}" if k is not None else f"{axis} ?" for axis, k in axes.items()))
+
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seed": seed,
+        },
+        "results": results,
+        "scaling": scaling,
+    }
+
+
+def compare(old, new, threshold=0.1) -> list[str]:
+    """Returns a line for every run in new that is more than threshold slower (or uses more memory) than in old"""
+    before = {(i["algorithm"], i["axis"], i["value"]): i for i in old["results"]}
+    regressions = []
+
+    for i in new["results"]:
+        key = (i["algorithm"], i["axis"], i["value"])
+        if key not in before:
+            continue
+
+        o = before[key]
+        if i["rounds_per_sec"] < o["rounds_per_sec"] * (1 - threshold):
+            regressions.append(f"{key}: {o['rounds_per_sec']:.1f} -> {i['rounds_per_sec']:.1f} rounds/s")
+        if i["peak_mb"] > o["peak_mb"] * (1 + threshold):
+            regressions.append(f"{key}: {o['peak_mb']:.2f} -> {i['peak_mb']:.2f} MB")
+
+    for name, axes in new["scaling"].items():
+        for axis, k in axes.items():
+            old_k = old["scaling"].get(name, {}).get(axis)
+            # Exponents are noisy, so only flag it if it went up by a fair amount
+            if k is not None and old_k is not None and k > old_k + 0.5:
+                regressions.append(f"{name} now scales as {axis} ^{k:.2f} (was ^{old_k:.2f})")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation replay")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("-o", "--output", default="benchmark.json")
+    run_parser.add_argument("--algorithm", action="append", default=[],
+                            help="Also benchmark this module:Class (can be given more than once)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=3)
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        # Your algorithms are benchmarked on top of the built in ones, so there's something to compare them with
+        data = run(list(dict.fromkeys(list(ALGORITHMS) + args.algorithm)), seed=args.seed, repeat=args.repeat)
+
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"Saved to `{args.output}`")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+
+        regressions = compare(old, new, args.threshold)
+        for i in regressions:
+            print(f"REGRESSION {i}")
+        print(f"{len(regressions)} regressions")
+
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
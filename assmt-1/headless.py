@@ -0,0 +1,193 @@
+"""Lets the a1_* modules be imported without pygame, for processes that never draw anything
+
+a1_visualizer imports pygame (and a1_entities/a1_simulation import a1_visualizer), so just importing the simulation
+costs as much as starting pygame, even with visualize=False. After install_null_pygame(), `import pygame` (and any
+`pygame.*` submodule) gives a stand in where every module level attribute, call and bit of arithmetic is a no-op:
+
+    import headless
+    headless.install_null_pygame()
+
+    from a1_simulation import Simulation  # pygame never gets imported
+
+The visualizer classes still get defined (Direction and the constants are real), they just don't do anything. Person
+and Elevator subclass pygame.sprite.Sprite, so Sprite and Group are plain classes that do nothing instead of the
+catch-all: a missing attribute on a person still raises AttributeError, and `len(person)` or `person + 1` still fail,
+exactly like with the real pygame. Don't use this in a process that has to show a window, like test_case_builder.py.
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import sys
+import types
+
+
+class _NullType(type):
+    # Lets the class itself stand in for things like `pygame.QUIT` or `pygame.Rect`
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Null
+
+    def __add__(cls, other):
+        return _Null
+
+    __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = __or__ = __ror__ = __and__ = __rand__ = __add__
+
+    def __int__(cls):
+        return 0
+
+    __index__ = __int__
+
+
+class _Null(metaclass=_NullType):
+    """Does nothing, whatever is done to it"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Null
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return True
+
+    def __add__(self, other):
+        return self
+
+    __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = __truediv__ = __floordiv__ = __neg__ = __add__
+
+    def __int__(self):
+        return 0
+
+    __index__ = __int__
+
+    def __float__(self):
+        return 0.0
+
+
+class _NullModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Null
+
+
+class _Sprite:
+    """pygame.sprite.Sprite that never belongs to any group. Anything that subclasses it behaves like a plain class"""
+
+    def __init__(self, *groups):
+        pass
+
+    def add(self, *groups):
+        pass
+
+    def remove(self, *groups):
+        pass
+
+    def kill(self):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+    def alive(self) -> bool:
+        return False
+
+    def groups(self) -> list:
+        return []
+
+
+class _Group:
+    """pygame.sprite.Group that stays empty, so drawing or updating it does nothing"""
+
+    def __init__(self, *sprites):
+        pass
+
+    def add(self, *sprites):
+        pass
+
+    def remove(self, *sprites):
+        pass
+
+    def empty(self):
+        pass
+
+    def has(self, *sprites) -> bool:
+        return False
+
+    def sprites(self) -> list:
+        return []
+
+    def copy(self):
+        return type(self)()
+
+    def update(self, *args, **kwargs):
+        pass
+
+    def draw(self, surface, *args, **kwargs) -> list:
+        return []
+
+    def clear(self, surface, background):
+        pass
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def __contains__(self, sprite):
+        return False
+
+
+# What pygame.sprite gets instead of the catch-all, every other group type is just a _Group here
+_SPRITE_CLASSES = {
+    "Sprite": _Sprite,
+    "DirtySprite": _Sprite,
+    "Group": _Group,
+    "GroupSingle": _Group,
+    "RenderPlain": _Group,
+    "RenderClear": _Group,
+    "RenderUpdates": _Group,
+    "OrderedUpdates": _Group,
+    "LayeredUpdates": _Group,
+    "LayeredDirty": _Group,
+}
+
+
+class _NullPygameFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, fullname, path, target=None):
+        if fullname == "pygame" or fullname.startswith("pygame."):
+            # A package, so `import pygame.sprite` and friends work too
+            return importlib.util.spec_from_loader(fullname, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        return _NullModule(spec.name)
+
+    def exec_module(self, module):
+        if module.__name__ == "pygame":
+            # The real pygame imports pygame.sprite itself, so `pygame.sprite.Sprite` works after just `import pygame`
+            importlib.import_module("pygame.sprite")
+        elif module.__name__ == "pygame.sprite":
+            vars(module).update(_SPRITE_CLASSES)
+
+
+def install_null_pygame() -> bool:
+    """Makes every later `import pygame` give the null one. Returns False (and does nothing) if the real pygame is
+    already imported, since swapping it out from under the modules using it would only break them"""
+    if "pygame" in sys.modules and not isinstance(sys.modules["pygame"], _NullModule):
+        return False
+
+    if not any(isinstance(i, _NullPygameFinder) for i in sys.meta_path):
+        sys.meta_path.insert(0, _NullPygameFinder())
+    return True
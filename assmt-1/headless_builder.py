@@ -0,0 +1,391 @@
+"""The test case builder without any GUI
+
+HeadlessBuilder does exactly what the ControlGrid buttons do (ControlGrid just calls into it and draws the result),
+so test cases can be scripted instead of clicked out. Nothing here imports tkinter or pygame.
+
+    b = HeadlessBuilder(5, 1, 2, auto_increase_wait=True, enforce_phase=True)
+    p = b.add_person(1, 5)
+    b.next_phase()  # BOARD
+    b.board(p, 0)
+    b.next_phase()  # MOVE
+    b.move_up(0)
+    b.next_round()
+    b.dump()
+"""
+from __future__ import annotations
+
+from enum import Enum
+import functools
+import os
+
+from trace_io import write_test_case
+
+
+class Phase(Enum):
+    DISEMBARK = 0
+    ARRIVAL = 1
+    BOARD = 2
+    MOVE = 3
+
+
+class BuilderError(Exception):
+    """Raised when an action isn't allowed right now (wrong phase, elevator on the wrong floor, ...)"""
+
+
+class _Action:
+    """One undoable call on the builder, stored as the (undo, redo) pair of every small change it made, so undoing or
+    redoing it only touches what actually changed"""
+
+    def __init__(self, name):
+        self.name = name
+        self.changes = []
+
+        # Set if this action saved a round (next_round)
+        self.saved_round = None
+
+    def undo(self):
+        for undo, _ in reversed(self.changes):
+            undo()
+
+    def redo(self):
+        for _, redo in self.changes:
+            redo()
+
+
+def _undoable(method):
+    """Records everything method changes as one action in the undo log. Calls from inside another undoable method
+    (like next_phase calling next_round) become part of the outer action"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.history or self._action is not None:
+            return method(self, *args, **kwargs)
+
+        self._action = action = _Action(method.__name__)
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            # Don't leave a half done action behind
+            action.undo()
+            raise
+        finally:
+            self._action = None
+
+        if action.changes:
+            self._undo_log.append(action)
+            self._redo_log.clear()
+
+        return result
+
+    return wrapper
+
+
+class TracePerson:
+    def __init__(self, start: int, target: int, index):
+        self.start = start
+        self.target = target
+        self.wait_time = 0
+
+        self.index = index
+        self.curr_elevator: TraceElevator | None = None
+        self.waiting = True
+
+    def __repr__(self) -> str:
+        return f'Person(start={self.start}, target={self.target}, wait_time={self.wait_time}, elevator={self.curr_elevator})'
+
+    def dump_data(self):
+        # Returns start, target, wait_time, on_elevator
+        return self.start, self.target, self.wait_time, self.curr_elevator is not None
+
+
+class TraceElevator:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.current_floor = 1
+        self.passengers: list[TracePerson] = []
+
+    def __repr__(self) -> str:
+        return f'Elevator(floor={self.current_floor}, passengers={len(self.passengers)}/{self.capacity})'
+
+
+class HeadlessBuilder:
+    """State of a test case being built
+
+    elevators and person_cls can be swapped for sprite versions (that's what ControlGrid does), as long as they have
+    the same attributes as TraceElevator and TracePerson.
+
+    With history, every action can be undone and redone, and goto_round jumps back (or forward) to right after any
+    saved round. Nothing is ever copied for this: each action logs how to undo and redo the few things it changed, and
+    saved rounds are never modified after they are saved so they can be shared. The log is never trimmed, so it's off
+    by default and only ControlGrid turns it on; scripts that never undo (like trace_generator.py) don't pay for it.
+    """
+
+    def __init__(self, num_floors, num_elevators=None, elevator_capacity=None, elevators=None,
+                 person_cls=TracePerson, auto_increase_wait=False, enforce_phase=False, auto_increase_phase=False,
+                 history=False):
+        if elevators is None:
+            elevators = [TraceElevator(elevator_capacity) for _ in range(num_elevators)]
+
+        self.num_floors = num_floors
+        self.elevators = elevators
+        self.person_cls = person_cls
+
+        # Auto increases wait time after each round
+        self.auto_increase_wait = auto_increase_wait
+        # Enforces Phases
+        self.enforce_phase = enforce_phase
+        # More Streamlined Phases
+        self.auto_increase_phase = auto_increase_phase
+
+        self.phase = Phase.ARRIVAL
+        self.round_num = 0
+        self.people = []
+
+        # Whether actions get logged so they can be undone
+        self.history = history
+        self._undo_log: list[_Action] = []
+        self._redo_log: list[_Action] = []
+        self._action: _Action | None = None
+
+        # Same layout as ControlGrid.data, see trace_io.py
+        self.data = {"config": {
+            "num_floors": num_floors,
+            "num_elevators": len(elevators),
+            "elevator_capacity": elevators[0].capacity,
+        }, "arrivals": {}, "rounds": {}}
+
+    def _record(self, undo, redo):
+        self._action.changes.append((undo, redo))
+
+    # Every change to the state has to go through one of these so it can be undone. Without history there's no action
+    # to record into, so they don't even build the undo/redo closures
+
+    def _set(self, obj, attr, value):
+        old = getattr(obj, attr)
+        setattr(obj, attr, value)
+        if self._action is not None:
+            self._record(lambda: setattr(obj, attr, old), lambda: setattr(obj, attr, value))
+
+    def _append(self, lst, item):
+        lst.append(item)
+        if self._action is not None:
+            self._record(lst.pop, lambda: lst.append(item))
+
+    def _remove(self, lst, item):
+        i = lst.index(item)
+        del lst[i]
+        if self._action is not None:
+            self._record(lambda: lst.insert(i, item), lambda: lst.pop(i))
+
+    def _set_item(self, d, key, value):
+        had_key, old = key in d, d.get(key)
+        d[key] = value
+        if self._action is None:
+            return
+
+        def undo():
+            if had_key:
+                d[key] = old
+            else:
+                del d[key]
+
+        self._record(undo, lambda: d.__setitem__(key, value))
+
+    def undo(self) -> str:
+        """Undoes the last action and returns its name"""
+        if not self.history:
+            raise BuilderError("Undo needs a builder made with history=True")
+        if not self._undo_log:
+            raise BuilderError("Nothing to undo")
+
+        action = self._undo_log.pop()
+        action.undo()
+        self._redo_log.append(action)
+
+        return action.name
+
+    def redo(self) -> str:
+        """Redoes the last undone action and returns its name"""
+        if not self.history:
+            raise BuilderError("Redo needs a builder made with history=True")
+        if not self._redo_log:
+            raise BuilderError("Nothing to redo")
+
+        action = self._redo_log.pop()
+        action.redo()
+        self._undo_log.append(action)
+
+        return action.name
+
+    def rewind_round(self):
+        """Undoes back to the start of this round, or the start of the round before if nothing was done in this one"""
+        self.undo()
+
+        while self._undo_log and self._undo_log[-1].saved_round is None:
+            self.undo()
+
+    def goto_round(self, round_num):
+        """Undoes (or redoes) everything back to right after round_num was saved"""
+        if not self.history:
+            raise BuilderError("goto_round needs a builder made with history=True")
+
+        def there():
+            return self._undo_log and self._undo_log[-1].saved_round == round_num
+
+        if any(i.saved_round == round_num for i in self._undo_log):
+            while not there():
+                self.undo()
+        elif any(i.saved_round == round_num for i in self._redo_log):
+            while not there():
+                self.redo()
+        else:
+            raise BuilderError(f"Round {round_num} was never saved")
+
+    def _enter_phase(self, phase):
+        if self.auto_increase_phase and self.phase.value < phase.value:
+            self._set(self, "phase", phase)
+
+        if self.enforce_phase and self.phase != phase:
+            raise BuilderError(f"Not in correct phase (in {self.phase}, need {phase})")
+
+    def _elevator(self, elevator):
+        # Elevators can be given by their number or the elevator itself
+        return self.elevators[elevator] if isinstance(elevator, int) else elevator
+
+    @_undoable
+    def add_person(self, start: int, target: int):
+        """A new person arrives on floor start wanting to go to target"""
+        self._enter_phase(Phase.ARRIVAL)
+
+        if not (1 <= start <= self.num_floors and 1 <= target <= self.num_floors):
+            raise BuilderError(f"Floors must be between 1 and {self.num_floors}")
+        elif start == target:
+            raise BuilderError("Person cannot be heading to the same floor that they came from")
+
+        person = self.person_cls(start, target, len(self.people) + 1)
+        self._append(self.people, person)
+
+        if self.round_num not in self.data["arrivals"]:
+            self._set_item(self.data["arrivals"], self.round_num, [])
+        self._append(self.data["arrivals"][self.round_num], (person.start, person.target))
+
+        return person
+
+    @_undoable
+    def increase_wait(self, person):
+        self._set(person, "wait_time", person.wait_time + 1)
+
+    @_undoable
+    def decrease_wait(self, person):
+        self._set(person, "wait_time", person.wait_time - 1)
+
+    @_undoable
+    def increase_all_wait(self):
+        for i in self.people:
+            if i.waiting:
+                self._set(i, "wait_time", i.wait_time + 1)
+
+    @_undoable
+    def check_can_board(self, person):
+        """Raises BuilderError if person can't board any elevator right now"""
+        self._enter_phase(Phase.BOARD)
+
+        if person.curr_elevator is not None or not person.waiting:
+            raise BuilderError("Person should be waiting for an elevator")
+
+    @_undoable
+    def board(self, person, elevator):
+        self.check_can_board(person)
+        elevator = self._elevator(elevator)
+
+        if elevator.current_floor != person.start:
+            raise BuilderError("Elevator must be in the same floor as the person")
+
+        self._set(person, "curr_elevator", elevator)
+        self._append(elevator.passengers, person)
+
+    @_undoable
+    def disembark(self, person):
+        """Takes person off their elevator and returns the elevator"""
+        self._enter_phase(Phase.DISEMBARK)
+
+        elevator = person.curr_elevator
+        if elevator is None:
+            raise BuilderError("Person is not on an elevator")
+
+        self._remove(elevator.passengers, person)
+        self._set(person, "curr_elevator", None)
+        self._set(person, "waiting", False)
+
+        return elevator
+
+    @_undoable
+    def move_up(self, elevator):
+        self._enter_phase(Phase.MOVE)
+        elevator = self._elevator(elevator)
+
+        if elevator.current_floor == self.num_floors:
+            raise BuilderError("Elevator is at its highest floor already")
+
+        self._set(elevator, "current_floor", elevator.current_floor + 1)
+
+    @_undoable
+    def move_down(self, elevator):
+        self._enter_phase(Phase.MOVE)
+        elevator = self._elevator(elevator)
+
+        if elevator.current_floor == 1:
+            raise BuilderError("Elevator is at its lowest floor already")
+
+        self._set(elevator, "current_floor", elevator.current_floor - 1)
+
+    @_undoable
+    def next_phase(self, phase=None):
+        """Goes to the next phase, or the next round if we're already moving elevators"""
+        if phase is None and self.phase is Phase.MOVE:
+            self.next_round()
+            return
+
+        self._set(self, "phase", {
+            -1: Phase.DISEMBARK,
+            Phase.DISEMBARK: Phase.ARRIVAL,
+            Phase.ARRIVAL: Phase.BOARD,
+            Phase.BOARD: Phase.MOVE,
+            Phase.MOVE: Phase.MOVE,
+        }[phase or self.phase])
+
+    @_undoable
+    def next_round(self) -> int:
+        """Saves the state of this round and starts the next one. Returns the round that was saved"""
+        if self.auto_increase_wait:
+            self.increase_all_wait()
+
+        self.next_phase(-1)
+
+        data = {
+            "elevators": [],
+            "people": []
+        }
+
+        for i in self.elevators:
+            data["elevators"].append([i.current_floor, [i.dump_data() for i in i.passengers]])
+
+        for i in self.people:
+            data["people"].append(i.dump_data())
+
+        self._set_item(self.data["rounds"], self.round_num, data)
+        if self._action is not None:
+            self._action.saved_round = self.round_num
+
+        self._set(self, "round_num", self.round_num + 1)
+        return self.round_num - 1
+
+    def dump(self, path=None, delta=False) -> str:
+        """Writes the test case to path (the next free test_cases/test_case_#.json by default) and returns the path"""
+        if path is None:
+            os.makedirs("test_cases", exist_ok=True)
+
+            path = f"test_cases/test_case_{len(os.listdir('test_cases'))}" + (".delta.json.gz" if delta else ".json")
+
+        write_test_case(self.data, path, delta=delta)
+        return path
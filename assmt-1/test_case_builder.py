@@ -1,17 +1,23 @@
 from __future__ import annotations
 
 import threading
+import queue
 import random
 from enum import Enum
-import json
-import os
 
 from a1_entities import Person, Elevator
-from a1_visualizer import Visualizer, WHITE, FPS, PersonSprite, ElevatorSprite, Direction, FLOOR_HEIGHT, _FloorSprite, WIDTH, _FloorNum, FLOOR_BORDER_HEIGHT
+from a1_visualizer import Visualizer, WHITE, PersonSprite, ElevatorSprite, Direction, FLOOR_HEIGHT, _FloorSprite, WIDTH, _FloorNum, FLOOR_BORDER_HEIGHT
+from headless_builder import HeadlessBuilder, BuilderError, Phase
 
 import tkinter as tk
 import pygame
 
+# How long (ms) the pygame loop sleeps waiting for events when there's nothing to draw
+IDLE_TIMEOUT = 100
+RENDER_EVENT = pygame.USEREVENT
+# How often (ms) the control panel picks up widget changes queued from the pygame loop
+UI_POLL_INTERVAL = 50
+
 
 class EnhancedPerson(Person):
     def __init__(self, start: int, target: int, index):
@@ -42,17 +48,11 @@ class State(Enum):
     BOARD_ELEVATOR = 2
 
 
-class Phase(Enum):
-    DISEMBARK = 0
-    ARRIVAL = 1
-    BOARD = 2
-    MOVE = 3
-
-
 class ControlGrid(tk.Frame):
     AUTO_INCREASE_WAIT = False
     ENFORCE_PHASE = False
     AUTO_INCREASE_PHASE = False
+    COMPACT_DUMP = False
 
     def __init__(self, master, visualizer: TestCaseVisualizer):
         tk.Frame.__init__(self, master)
@@ -61,62 +61,90 @@ class ControlGrid(tk.Frame):
         self.master = master
         self.visualizer = visualizer
 
-        self.phase = Phase.ARRIVAL
-
-        self.people: list[EnhancedPerson] = []
-        # self.people_buttons = []
+        # All the actual state changes happen in here, this class just turns clicks into calls and draws the result
+        self.builder = HeadlessBuilder(self.visualizer._num_floors, elevators=self.visualizer.elevators,
+                                       person_cls=EnhancedPerson,
+                                       auto_increase_wait=ControlGrid.AUTO_INCREASE_WAIT,
+                                       enforce_phase=ControlGrid.ENFORCE_PHASE,
+                                       auto_increase_phase=ControlGrid.AUTO_INCREASE_PHASE,
+                                       history=True)
 
         self.curr_state = None
         self.temp_data = None
 
+        # Widget changes that have to happen on the tk thread, see _ui
+        self._ui_queue = queue.SimpleQueue()
+        self._person_buttons = []
+        self.after(UI_POLL_INTERVAL, self._drain_ui)
+
         tk.Label(self, text="People").grid(row=0, column=0)
 
-        tk.Button(self, text="Deselect", command=self.deselect_cb, width=15).grid(row=1, column=0)
+        tk.Button(self, text="Deselect", command=self._queued(self.deselect_cb), width=15).grid(row=1, column=0)
 
         tk.Label(self, text="Elevators").grid(row=6, column=0)
 
-        tk.Button(self, text="Deselect", command=self.deselect_cb, width=15).grid(row=7, column=0)
+        tk.Button(self, text="Deselect", command=self._queued(self.deselect_cb), width=15).grid(row=7, column=0)
 
         for i, j in enumerate(self.visualizer.elevators):
-            tk.Button(self, text=f"Elevator {i}", command=lambda x=(j, i): self.select_elevator_cb(*x), width=15).grid(row=7, column=i + 1)
+            tk.Button(self, text=f"Elevator {i}", command=self._queued(lambda x=(j, i): self.select_elevator_cb(*x)), width=15).grid(row=7, column=i + 1)
 
         tk.Label(self, text="Floors").grid(row=8, column=0)
 
         for k in range(self.visualizer._num_floors):
-            tk.Button(self, text=f"Floor {k + 1}", command=lambda x=k: self.select_floor_cb(x + 1), width=15).grid(row=9, column=k)
+            tk.Button(self, text=f"Floor {k + 1}", command=self._queued(lambda x=k: self.select_floor_cb(x + 1)), width=15).grid(row=9, column=k)
 
         tk.Label(self, text="Misc Widgets").grid(row=10, column=0)
 
-        tk.Button(self, text="Increase Wait", command=self.increase_wait_cb, width=15).grid(row=11, column=0)
-        tk.Button(self, text="Increase All Wait", command=self.increase_all_wait_cb, width=15).grid(row=11, column=1)
-        tk.Button(self, text="Decrease Wait", command=self.decrease_wait_cb, width=15).grid(row=11, column=2)
-
-        tk.Button(self, text="Board Elevator", command=self.board_elevator_cb, width=15).grid(row=12, column=0)
-        tk.Button(self, text="Disembark Elevator", command=self.disembark_elevator_cb, width=15).grid(row=12, column=1)
-
-        tk.Button(self, text="Move Elevator Up", command=self.elevator_going_up, width=15).grid(row=13, column=0)
-        tk.Button(self, text="Move Elevator Down", command=self.elevator_going_down, width=15).grid(row=13, column=1)
-
-        tk.Button(self, text="Add Person", command=self.add_person_cb, width=15).grid(row=14, column=0)
-        tk.Button(self, text="Next Phase", command=self.next_phase_cb, width=15).grid(row=14, column=1)
-        tk.Button(self, text="Next Round", command=self.next_round_cb, width=15).grid(row=14, column=2)
-
-        tk.Button(self, text="Dump To File", command=self.dump_to_file, width=15).grid(row=15, column=0)
-
-        # {
-        #   "arrivals": {round_num: [(from, target)]}
-        #   "rounds": {
-        #       round_num: {
-        #           "elevators": [(elevator_pos, [dump_data])]}
-        #           "people": [dump_data]
-        #       }
-        #   }
-        # }
-        self.data = {"config": {
-            "num_floors": self.visualizer._num_floors,
-            "num_elevators": len(self.visualizer.elevators),
-            "elevator_capacity": self.visualizer.elevators[0].capacity,
-        }, "arrivals": {}, "rounds": {}}
+        tk.Button(self, text="Increase Wait", command=self._queued(self.increase_wait_cb), width=15).grid(row=11, column=0)
+        tk.Button(self, text="Increase All Wait", command=self._queued(self.increase_all_wait_cb), width=15).grid(row=11, column=1)
+        tk.Button(self, text="Decrease Wait", command=self._queued(self.decrease_wait_cb), width=15).grid(row=11, column=2)
+
+        tk.Button(self, text="Board Elevator", command=self._queued(self.board_elevator_cb), width=15).grid(row=12, column=0)
+        tk.Button(self, text="Disembark Elevator", command=self._queued(self.disembark_elevator_cb), width=15).grid(row=12, column=1)
+
+        tk.Button(self, text="Move Elevator Up", command=self._queued(self.elevator_going_up), width=15).grid(row=13, column=0)
+        tk.Button(self, text="Move Elevator Down", command=self._queued(self.elevator_going_down), width=15).grid(row=13, column=1)
+
+        tk.Button(self, text="Add Person", command=self._queued(self.add_person_cb), width=15).grid(row=14, column=0)
+        tk.Button(self, text="Next Phase", command=self._queued(self.next_phase_cb), width=15).grid(row=14, column=1)
+        tk.Button(self, text="Next Round", command=self._queued(self.next_round_cb), width=15).grid(row=14, column=2)
+
+        tk.Button(self, text="Dump To File", command=self._queued(self.dump_to_file), width=15).grid(row=15, column=0)
+        tk.Button(self, text="Undo", command=self._queued(self.undo_cb), width=15).grid(row=15, column=1)
+        tk.Button(self, text="Redo", command=self._queued(self.redo_cb), width=15).grid(row=15, column=2)
+        tk.Button(self, text="Rewind Round", command=self._queued(self.rewind_round_cb), width=15).grid(row=15, column=3)
+
+    def _queued(self, command):
+        # Buttons don't run their callbacks here on the tk thread. They get queued up and run by the pygame loop, so
+        # every state change and redraw happens on one thread and a burst of clicks only redraws once
+        return lambda: self.visualizer.post(command)
+
+    def _ui(self, command):
+        """Runs command on the tk thread (callbacks run on the pygame thread, and tk isn't thread safe)"""
+        self._ui_queue.put(command)
+
+    def _drain_ui(self):
+        while True:
+            try:
+                command = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            command()
+
+        self.after(UI_POLL_INTERVAL, self._drain_ui)
+
+    @property
+    def phase(self):
+        return self.builder.phase
+
+    @property
+    def people(self) -> list[EnhancedPerson]:
+        return self.builder.people
+
+    @property
+    def data(self):
+        # See trace_io.py for the layout
+        return self.builder.data
 
     def clicked_sprites(self, sprites):
         for i in sprites:
@@ -130,23 +158,31 @@ class ControlGrid(tk.Frame):
                 self.select_floor_cb(i.f_num)
                 # print(f"Floor num: {i.f_num}")
 
-    def add_new_person(self, person):
-        if ControlGrid.AUTO_INCREASE_PHASE and self.phase.value < Phase.ARRIVAL.value:
-            self.phase = Phase.ARRIVAL
-
-        if ControlGrid.ENFORCE_PHASE and self.phase != Phase.ARRIVAL:
-            print("Not in correct phase")
+    def add_new_person(self, start, target):
+        try:
+            person = self.builder.add_person(start, target)
+        except BuilderError as e:
+            print(e)
             return
 
-        self.people.append(person)
-        tk.Button(self, text=f"Person {len(self.people)}", command=lambda: self.select_person_cb(person), width=15).grid(row=1, column=len(self.people))
-
-        if self.visualizer.round_num not in self.data["arrivals"]:
-            self.data["arrivals"][self.visualizer.round_num] = []
-        self.data["arrivals"][self.visualizer.round_num].append((person.start, person.target))
+        self._sync_person_buttons()
 
         self.visualizer.show_arrivals({person.start: [person]})
 
+    def _sync_person_buttons(self):
+        people = list(self.people)
+        self._ui(lambda: self._update_person_buttons(people))
+
+    def _update_person_buttons(self, people):
+        # Runs on the tk thread. Adds buttons for new people and removes the ones for people that got undone
+        while len(self._person_buttons) > len(people):
+            self._person_buttons.pop().destroy()
+
+        for n in range(len(self._person_buttons), len(people)):
+            button = tk.Button(self, text=f"Person {n + 1}", command=self._queued(lambda p=people[n]: self.select_person_cb(p)), width=15)
+            button.grid(row=1, column=n + 1)
+            self._person_buttons.append(button)
+
     def add_person_cb(self):
         self.curr_state = State.ADD_PERSON_FROM_FLOOR
         print("Click the floor you would like the person to come from")
@@ -165,20 +201,18 @@ class ControlGrid(tk.Frame):
         if self.visualizer.highlight_person is None:
             print("Select a person before doing this")
         else:
-            self.visualizer.highlight_person.wait_time += 1
+            self.builder.increase_wait(self.visualizer.highlight_person)
             self.visualizer.render()
 
     def decrease_wait_cb(self):
         if self.visualizer.highlight_person is None:
             print("Select a person before doing this")
         else:
-            self.visualizer.highlight_person.wait_time -= 1
+            self.builder.decrease_wait(self.visualizer.highlight_person)
             self.visualizer.render_header(self.visualizer.round_num)
 
     def increase_all_wait_cb(self):
-        for i in self.people:
-            if i.waiting:
-                i.wait_time += 1
+        self.builder.increase_all_wait()
         self.visualizer.render_header(self.visualizer.round_num)
 
     def next_phase_cb(self):
@@ -189,78 +223,82 @@ class ControlGrid(tk.Frame):
             self.next_round_cb()
             return
 
-        self.phase = {
-            -1: Phase.DISEMBARK,
-            Phase.DISEMBARK: Phase.ARRIVAL,
-            Phase.ARRIVAL: Phase.BOARD,
-            Phase.BOARD: Phase.MOVE,
-            Phase.MOVE: Phase.MOVE,
-        }[phase or self.phase]
+        self.builder.next_phase(phase)
+        self.show_phase()
 
+    def show_phase(self):
         print(f"Switch to phase {self.phase}")
-        self.master.title(f"Control Panel - {self.phase}")
+        self._ui(lambda title=f"Control Panel - {self.phase}": self.master.title(title))
 
     def next_round_cb(self):
-        if ControlGrid.AUTO_INCREASE_WAIT:
-            self.increase_all_wait_cb()
-
-        self.next_phase(-1)
-
-        data = {
-            "elevators": [],
-            "people": []
-        }
+        round_num = self.builder.next_round()
+        self.show_phase()
 
-        for i in self.visualizer.elevators:
-            data["elevators"].append([i.current_floor, [i.dump_data() for i in i.passengers]])
+        print(f"Saving Round {round_num}")
+        self.visualizer.next_round()
 
-        for i in self.people:
-            data["people"].append(i.dump_data())
+    def dump_to_file(self):
+        path = self.builder.dump(delta=ControlGrid.COMPACT_DUMP)
+        print(f"Dumped to `{path}`")
+
+    def undo_cb(self):
+        try:
+            print(f"Undid {self.builder.undo()}")
+        except BuilderError as e:
+            print(e)
+        else:
+            self.sync_view()
 
-        self.data["rounds"][self.visualizer.round_num] = data
+    def redo_cb(self):
+        try:
+            print(f"Redid {self.builder.redo()}")
+        except BuilderError as e:
+            print(e)
+        else:
+            self.sync_view()
 
-        print(f"Saving Round {self.visualizer.round_num}")
-        self.visualizer.next_round()
+    def rewind_round_cb(self):
+        try:
+            self.builder.rewind_round()
+        except BuilderError as e:
+            print(e)
+        else:
+            print(f"Rewound to the start of round {self.builder.round_num}")
+            self.sync_view()
 
-    def dump_to_file(self):
-        os.makedirs("test_cases", exist_ok=True)
+    def sync_view(self):
+        # Undo/redo changes the state behind the visualizer's back, so everything has to be put back in place
+        self.curr_state = None
+        self.temp_data = None
 
-        with open(f"test_cases/test_case_{len(os.listdir('test_cases'))}.json", "w") as f:
-            json.dump(self.data, f, indent=2)
+        self.visualizer.sync(self.builder)
+        self._sync_person_buttons()
+        self.show_phase()
 
     def board_elevator_cb(self):
-        if ControlGrid.AUTO_INCREASE_PHASE and self.phase.value < Phase.BOARD.value:
-            self.phase = Phase.BOARD
-
-        if ControlGrid.ENFORCE_PHASE and self.phase != Phase.BOARD:
-            print("Not in correct phase")
-        elif self.visualizer.highlight_person is None:
+        if self.visualizer.highlight_person is None:
             print("Select a person before doing this")
+            return
+
+        try:
+            self.builder.check_can_board(self.visualizer.highlight_person)
+        except BuilderError as e:
+            print(e)
         else:
-            p = self.visualizer.highlight_person
-            if p.curr_elevator is None and p.waiting:
-                self.curr_state = State.BOARD_ELEVATOR
-                print("Click the elevator you would like the person to board")
-            else:
-                print("Person should be waiting for an elevator")
+            self.curr_state = State.BOARD_ELEVATOR
+            print("Click the elevator you would like the person to board")
 
     def disembark_elevator_cb(self):
-        if ControlGrid.AUTO_INCREASE_PHASE and self.phase.value < Phase.DISEMBARK.value:
-            self.phase = Phase.DISEMBARK
-
-        if ControlGrid.ENFORCE_PHASE and self.phase != Phase.DISEMBARK:
-            print("Not in correct phase")
-        elif self.visualizer.highlight_person is None:
+        if self.visualizer.highlight_person is None:
             print("Select a person before doing this")
+            return
+
+        try:
+            e = self.builder.disembark(self.visualizer.highlight_person)
+        except BuilderError as e:
+            print(e)
         else:
-            e = self.visualizer.highlight_person.curr_elevator
-            if e is not None:
-                e.passengers.remove(self.visualizer.highlight_person)
-                self.visualizer.highlight_person.curr_elevator = None
-                self.visualizer.highlight_person.waiting = False
-                self.visualizer.show_disembarking(self.visualizer.highlight_person, e)
-            else:
-                print("Select a person who is on an elevator first")
+            self.visualizer.show_disembarking(self.visualizer.highlight_person, e)
 
     def select_elevator_cb(self, elevator, elevator_num):
         if self.curr_state == State.BOARD_ELEVATOR:
@@ -270,16 +308,15 @@ class ControlGrid(tk.Frame):
 
             p = self.visualizer.highlight_person
 
-            if elevator.current_floor != p.start:
-                print(f"Elevator must be in the same floor as the person")
+            try:
+                self.builder.board(p, elevator)
+            except BuilderError as e:
+                print(e)
                 return
             self.curr_state = None
 
             print(f"Person {p.index} is boarding elevator {elevator_num}")
 
-            p.curr_elevator = elevator
-            elevator.passengers.append(p)
-
             self.visualizer.show_boarding(p, elevator)
         else:
             self.visualizer.update_highlight(elevator)
@@ -296,39 +333,38 @@ class ControlGrid(tk.Frame):
             else:
                 print(f"Person is going from floor {self.temp_data} to {floor_num}")
 
-                p = EnhancedPerson(self.temp_data, floor_num, len(self.people) + 1)
-                self.add_new_person(p)
+                self.add_new_person(self.temp_data, floor_num)
 
                 self.curr_state = None
                 self.temp_data = None
 
     def elevator_going_up(self):
-        if ControlGrid.AUTO_INCREASE_PHASE and self.phase.value < Phase.MOVE.value:
-            self.phase = Phase.MOVE
+        e = self.visualizer.highlight_elevator
 
-        if ControlGrid.ENFORCE_PHASE and self.phase != Phase.MOVE:
-            print("Not in correct phase")
-        elif self.visualizer.highlight_elevator is None:
+        if e is None:
             print("Select an elevator first")
-        elif self.visualizer.highlight_elevator.current_floor == self.visualizer._num_floors:
-            print("Elevator is at its highest floor already")
+            return
+
+        try:
+            self.builder.move_up(e)
+        except BuilderError as err:
+            print(err)
         else:
-            self.visualizer.highlight_elevator.current_floor += 1
-            self.visualizer.show_elevator_moves([self.visualizer.highlight_elevator], [Direction.UP])
+            self.visualizer.show_elevator_moves([e], [Direction.UP])
 
     def elevator_going_down(self):
-        if ControlGrid.AUTO_INCREASE_PHASE and self.phase.value < Phase.MOVE.value:
-            self.phase = Phase.MOVE
+        e = self.visualizer.highlight_elevator
 
-        if ControlGrid.ENFORCE_PHASE and self.phase != Phase.MOVE:
-            print("Not in correct phase")
-        elif self.visualizer.highlight_elevator is None:
+        if e is None:
             print("Select an elevator first")
-        elif self.visualizer.highlight_elevator.current_floor == 1:
-            print("Elevator is at its lowest floor already")
+            return
+
+        try:
+            self.builder.move_down(e)
+        except BuilderError as err:
+            print(err)
         else:
-            self.visualizer.highlight_elevator.current_floor -= 1
-            self.visualizer.show_elevator_moves([self.visualizer.highlight_elevator], [Direction.DOWN])
+            self.visualizer.show_elevator_moves([e], [Direction.DOWN])
 
     @staticmethod
     def run(visualizer):
@@ -352,6 +388,14 @@ class TestCaseVisualizer(Visualizer):
         self.highlight_person: EnhancedPerson | None = None
         self.highlight_elevator: Elevator | None = None
 
+        # What every sprite looked like last frame, {sprite: (rect, image)}, so render only repaints what changed
+        self._render_state = None
+        self._last_highlight = None
+
+        # Callbacks from the control panel, run in batches by the pygame loop (see post)
+        self.commands = queue.SimpleQueue()
+        self._batching = False
+
         Visualizer.__init__(self, elevators, num_floors, True)
 
         self.elevators = elevators
@@ -364,7 +408,17 @@ class TestCaseVisualizer(Visualizer):
 
     def run(self):
         while self.is_running:
-            for event in pygame.event.get():
+            if self.update_render:
+                events = pygame.event.get()
+            else:
+                # Sleep until something happens instead of spinning a core (and hogging the GIL from the control
+                # panel). request_render posts an event so this wakes up right away when there's something to draw
+                events = [pygame.event.wait(IDLE_TIMEOUT)] + pygame.event.get()
+
+            # Everything that happens this frame only draws once at the end
+            self._batching = True
+
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.is_running = False
                 elif event.type == pygame.MOUSEBUTTONUP:
@@ -374,11 +428,30 @@ class TestCaseVisualizer(Visualizer):
                     if self.control_grid:
                         self.control_grid.clicked_sprites(clicked_sprites)
 
+            while True:
+                try:
+                    command = self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                command()
+
+            self._batching = False
+
             if self.update_render:
                 self.update_render = False
 
                 self.render_header(self.round_num)
 
+    def post(self, command):
+        """Queues command to run on the pygame loop. Safe to call from the control panel's thread"""
+        self.commands.put(command)
+        pygame.event.post(pygame.event.Event(RENDER_EVENT))
+
+    def request_render(self):
+        """Asks the pygame loop to redraw. Safe to call from the control panel's thread"""
+        self.update_render = True
+        pygame.event.post(pygame.event.Event(RENDER_EVENT))
+
     def update_highlight(self, thing: Elevator | Person | None):
         self.highlight_person = None
         self.highlight_elevator = None
@@ -388,31 +461,77 @@ class TestCaseVisualizer(Visualizer):
         elif isinstance(thing, Person):
             self.highlight_person = thing
 
-        self.update_render = True
+        self.request_render()
 
-    def render(self) -> None:
+    def _highlight_rect(self) -> pygame.Rect | None:
+        if self.highlight_person is not None:
+            return pygame.Rect(self.highlight_person.rect)
+        elif self.highlight_elevator is not None:
+            return self.highlight_elevator.rect.inflate(10, 10)
+        return None
+
+    def render(self, full=False) -> None:
         """Draw the current state of the simulation to the screen.
+
+        Only the parts of the screen where a sprite moved, changed image, appeared or disappeared are repainted,
+        unless full is set.
         """
         if not self._visualize:
             return
+        elif self._batching:
+            # Coalesce everything in this batch into one render at the end of the frame
+            self.update_render = True
+            return
 
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
 
-        self._screen.fill(WHITE)
+        highlight = self._highlight_rect()
+        sprites = self._sprite_group.sprites() + self._stats_group.sprites()
+        # Holding onto the image (instead of its id) means a new image can never be mistaken for the old one
+        state = {i: (tuple(i.rect), i.image) for i in sprites}
 
-        if self.highlight_person is not None:
-            pygame.draw.rect(self._screen, (255, 0, 0), self.highlight_person.rect)
+        if full or self._render_state is None:
+            dirty = [self._screen.get_rect()]
+        else:
+            dirty = []
+
+            for sprite, (rect, image) in state.items():
+                old = self._render_state.pop(sprite, None)
+
+                if old is None:
+                    dirty.append(pygame.Rect(rect))
+                elif old[0] != rect or old[1] is not image:
+                    dirty += [pygame.Rect(rect), pygame.Rect(old[0])]
 
-        if self.highlight_elevator is not None:
-            temp = self.highlight_elevator.rect
+            # Whatever is left isn't on the screen anymore
+            dirty += [pygame.Rect(rect) for rect, _ in self._render_state.values()]
 
-            pygame.draw.rect(self._screen, (255, 0, 0), pygame.Rect(temp.left - 5, temp.top - 5, temp.width + 10, temp.height + 10))
+            if highlight != self._last_highlight:
+                dirty += [i for i in (highlight, self._last_highlight) if i is not None]
 
-        self._sprite_group.draw(self._screen)
-        self._stats_group.draw(self._screen)
-        self._clock.tick(FPS)
-        pygame.display.flip()
+        self._render_state = state
+        self._last_highlight = highlight
+
+        if not dirty:
+            return
+
+        # Repaint each dirty area from the back to the front, clipped so nothing outside of it gets touched
+        for area in dirty:
+            self._screen.set_clip(area)
+            self._screen.fill(WHITE)
+
+            if highlight is not None:
+                pygame.draw.rect(self._screen, (255, 0, 0), highlight)
+
+            for sprite in sprites:
+                if sprite.rect.colliderect(area):
+                    self._screen.blit(sprite.image, sprite.rect)
+
+        self._screen.set_clip(None)
+
+        # No FPS throttle here, these are one off redraws from button presses
+        pygame.display.update(dirty)
 
     def show_arrivals(self,
                       arrivals: dict[int, list[PersonSprite]]) -> None:
@@ -484,7 +603,38 @@ class TestCaseVisualizer(Visualizer):
 
     def next_round(self):
         self.round_num += 1
-        self.update_render = True
+        self.request_render()
+
+    def sync(self, builder: HeadlessBuilder):
+        """Moves every sprite to match the builder (after an undo or redo, which don't go through the show_ methods)"""
+        self.round_num = builder.round_num
+        people = set(builder.people)
+
+        for sprite in self._sprite_group.sprites():
+            if isinstance(sprite, Person) and sprite not in people:
+                self._sprite_group.remove(sprite)
+
+        if self.highlight_person is not None and self.highlight_person not in people:
+            self.highlight_person = None
+
+        for elevator in self.elevators:
+            elevator.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT - (elevator.current_floor - 1) * FLOOR_HEIGHT
+            elevator.update()
+
+        for person in builder.people:
+            if person.curr_elevator is not None:
+                person.rect.centerx = person.curr_elevator.rect.centerx
+                person.rect.bottom = self._get_y_of_floor(person.curr_elevator.current_floor)
+            elif person.waiting:
+                person.rect.centerx = 10
+                person.rect.bottom = self._get_y_of_floor(person.start)
+            else:
+                # Already off, they stay on whatever floor they got off at
+                person.rect.centerx = WIDTH - 10
+
+            self._sprite_group.add(person)
+
+        self.request_render()
 
 
 def main(num_floors_, num_elevators_, elevator_capacity_):
@@ -499,6 +649,8 @@ if __name__ == "__main__":
     ControlGrid.ENFORCE_PHASE = True
     # More Streamlined Phases
     ControlGrid.AUTO_INCREASE_PHASE = False
+    # Dumps only what changed each round (gzipped), much smaller for long test cases
+    ControlGrid.COMPACT_DUMP = False
 
     num_floors = 5
     num_elevators = 1
@@ -1,107 +1,744 @@
+# Nothing here draws anything, so the a1_* modules get a null pygame instead of paying to import the real one
+import headless
+headless.install_null_pygame()
+
 from a1_entities import Person
 from a1_simulation import Simulation
 from a1_algorithms import ArrivalGenerator, EndToEndLoop, FurthestFloor
 
+from trace_io import TestCaseReader
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+import csv
+import hashlib
+import importlib
 import json
+import os
+import pickle
+import signal
+import sys
+import time
+
+# With fail_fast or quiet, every person (not just the ones still in the building) is checked every this many rounds, see
+# test_simulation
+FULL_CHECK_INTERVAL = 100
 
 
 class TestCaseGenerator(ArrivalGenerator):
-    def __init__(self, arrivals):
+    def __init__(self, arrivals=None):
         super().__init__(2)
 
-        self.arrivals = arrivals
+        # {round_num: ([floors], [(from, target)])}, the floors are precomputed so generate doesn't have to group people
+        self.schedule = {}
         self.arrived_people = []
+        # Everyone who hasn't gotten off yet, {index in arrived_people: person}. See update_active
+        self.active = {}
+
+        # Either everything up front, or fed one round at a time from a TestCaseReader
+        if arrivals is not None:
+            for rn, i in arrivals.items():
+                self.feed(int(rn), i)
+
+    def feed(self, round_num: int, arrivals) -> None:
+        """Queues the (from, target) arrivals for round_num"""
+        if arrivals:
+            self.schedule[round_num] = (list(dict.fromkeys(i[0] for i in arrivals)), arrivals)
 
     def generate(self, round_num: int) -> dict[int, list[Person]]:
-        if str(round_num) not in self.arrivals:
+        # Each round is only generated once, so drop it to keep memory flat on long traces
+        if (scheduled := self.schedule.pop(round_num, None)) is None:
             return {}
-        else:
-            data_ = {}
 
-            for i in self.arrivals[str(round_num)]:
-                if i[0] not in data_:
-                    data_[i[0]] = []
+        floors, arrivals = scheduled
+        data_ = {floor: [] for floor in floors}
+
+        # People have to be made in the order they arrive, since that's the order of the recorded people
+        for start, target in arrivals:
+            p = Person(start, target)
+            data_[start].append(p)
+
+            self.active[len(self.arrived_people)] = p
+            self.arrived_people.append(p)
+
+        return data_
+
+    def update_active(self, sim) -> None:
+        """Drops everyone who isn't waiting or on an elevator anymore from active. Costs O(people still in the
+        building), not O(everyone who ever arrived)"""
+        waiting = getattr(sim, "waiting", None)
+        if waiting is None:  # Can't tell who's done, so everyone stays active
+            return
+
+        present = passenger_index(sim.elevators)
+        present.update(id(p) for people in waiting.values() for p in people)
 
-                p = Person(*i)
-                data_[i[0]].append(p)
-                self.arrived_people.append(p)
+        self.active = {i: p for i, p in self.active.items() if id(p) in present}
 
-            return data_
+
+def passenger_index(elevators) -> set[int]:
+    """Returns the ids of everyone currently on an elevator. Build this once per round and pass it to the dumpers"""
+    return {id(p) for e in elevators for p in e.passengers}
 
 
 def dump_person_data(person, ppl_in_elvt):
-    return [person.start, person.target, person.wait_time, person in ppl_in_elvt]
+    # ppl_in_elvt is a passenger_index, so this is a set lookup instead of scanning every rider
+    return [person.start, person.target, person.wait_time, id(person) in ppl_in_elvt]
 
 
 def dump_elevator_data(elevator, ppl_in_elvt):
     return [elevator.current_floor, [dump_person_data(p, ppl_in_elvt) for p in elevator.passengers]]
 
 
-def run_sim(sim, round_num):
+class _CountingAlgorithm:
+    """Stands in for a moving_algorithm and counts/times every method call made on it"""
+
+    def __init__(self, algorithm, profiler):
+        self._algorithm = algorithm
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._algorithm, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._profiler.count_call(name, time.perf_counter() - start)
+
+        return counted
+
+
+class StageProfiler:
+    """Opt in timing of run_sim: wall and CPU time of every stage of every round, plus how many times (and how long)
+    each method of the moving_algorithm was called
+
+    Pass one to test_simulation (or run_sim), then look at summary() or export with to_json/to_csv.
+    """
+
+    def __init__(self):
+        self.rows = []  # (round_num, stage, wall seconds, cpu seconds)
+        self.calls = {}  # moving_algorithm method -> [calls, wall seconds]
+
+    def instrument(self, sim):
+        """Starts counting calls on sim's moving_algorithm"""
+        if not isinstance(sim.moving_algorithm, _CountingAlgorithm):
+            sim.moving_algorithm = _CountingAlgorithm(sim.moving_algorithm, self)
+
+    def count_call(self, name, wall):
+        if name not in self.calls:
+            self.calls[name] = [0, 0.0]
+        self.calls[name][0] += 1
+        self.calls[name][1] += wall
+
+    @contextmanager
+    def stage(self, round_num, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.rows.append((round_num, name, time.perf_counter() - wall, time.process_time() - cpu))
+
+    def stage_totals(self) -> dict[str, dict[str, float]]:
+        """Returns {stage: {"rounds", "wall", "cpu", "max_wall"}} in stage order"""
+        totals = {}
+
+        for _, name, wall, cpu in self.rows:
+            if name not in totals:
+                totals[name] = {"rounds": 0, "wall": 0.0, "cpu": 0.0, "max_wall": 0.0}
+
+            t = totals[name]
+            t["rounds"] += 1
+            t["wall"] += wall
+            t["cpu"] += cpu
+            t["max_wall"] = max(t["max_wall"], wall)
+
+        return totals
+
+    def summary(self) -> str:
+        totals = self.stage_totals()
+        total_wall = sum(i["wall"] for i in totals.values()) or 1
+
+        lines = [f"{'stage':<22}{'rounds':>8}{'wall (s)':>12}{'cpu (s)':>12}{'mean (ms)':>12}{'max (ms)':>12}{'share':>8}"]
+        for name, t in totals.items():
+            lines.append(f"{name:<22}{t['rounds']:>8}{t['wall']:>12.4f}{t['cpu']:>12.4f}"
+                         f"{t['wall'] / t['rounds'] * 1000:>12.4f}{t['max_wall'] * 1000:>12.4f}{t['wall'] / total_wall:>8.1%}")
+
+        if self.calls:
+            lines.append("")
+            lines.append(f"{'moving_algorithm':<22}{'calls':>8}{'wall (s)':>12}{'mean (ms)':>12}")
+            for name, (calls, wall) in self.calls.items():
+                lines.append(f"{name:<22}{calls:>8}{wall:>12.4f}{wall / calls * 1000:>12.4f}")
+
+        return "\n".join(lines)
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "stages": self.stage_totals(),
+                "calls": {name: {"calls": calls, "wall": wall} for name, (calls, wall) in self.calls.items()},
+                "rounds": [{"round": rn, "stage": name, "wall": wall, "cpu": cpu} for rn, name, wall, cpu in self.rows],
+            }, f, indent=2)
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["round", "stage", "wall", "cpu"])
+            writer.writerows(self.rows)
+
+
+def run_sim(sim, round_num, profiler=None):
+    stage = profiler.stage if profiler is not None else lambda *_: nullcontext()
+
     sim.visualizer.render_header(round_num)
 
     # Stage 1: elevator disembarking
-    sim.handle_disembarking()
+    with stage(round_num, "handle_disembarking"):
+        sim.handle_disembarking()
 
     # Stage 2: new arrivals
-    sim.generate_arrivals(round_num)
+    with stage(round_num, "generate_arrivals"):
+        sim.generate_arrivals(round_num)
 
     # Stage 3: elevator boarding
-    sim.handle_boarding()
+    with stage(round_num, "handle_boarding"):
+        sim.handle_boarding()
 
     # Stage 4: move the elevators
-    sim.move_elevators()
+    with stage(round_num, "move_elevators"):
+        sim.move_elevators()
 
     # Stage 5: update wait times
-    sim.update_wait_times()
+    with stage(round_num, "update_wait_times"):
+        sim.update_wait_times()
 
 
-def test_simulation(test_case_path, moving_algorithm):
-    with open(test_case_path) as f:
-        data = json.load(f)
+class SimulationResult:
+    """Everything that happened while replaying one test case
 
-    gen = TestCaseGenerator(data["arrivals"])
+    diffs holds (round_num, kind, index, expected, got) for every mismatch, where kind is "elevator", "person" or
+    "people count". round_times maps a round number to the seconds spent simulating it.
+    """
 
-    config = data["config"]
-    config["arrival_generator"] = gen
-    config["moving_algorithm"] = moving_algorithm
-    config["visualize"] = False
+    def __init__(self, test_case_path, algorithm):
+        self.test_case_path = test_case_path
+        self.algorithm = algorithm
 
-    s = Simulation(config)
+        self.diffs = []
+        self.round_times = {}
+        self.error = None
+        # Set by run_test_cases when the result came out of a ResultCache instead of a replay
+        self.cached = False
 
-    for rn, round_ in data["rounds"].items():
-        # The test cases only dump data after the simulation is done
-        run_sim(s, int(rn))
+    @property
+    def passed(self):
+        return self.error is None and not self.diffs
 
-        ppl_in_elvt = []
-        for j in s.elevators:
-            ppl_in_elvt += j.passengers
+    def __repr__(self) -> str:
+        status = "passed" if self.passed else f"failed ({len(self.diffs)} diffs, error={self.error})"
+        return f"SimulationResult({self.test_case_path}, {self.algorithm}, {status}{', cached' if self.cached else ''})"
 
-        # Checking elevators
-        for i, (e1, e2) in enumerate(zip(round_["elevators"], s.elevators)):
-            if e1 != dump_elevator_data(e2, ppl_in_elvt):
-                print(
-                    f"Error in round {rn} for test case `{test_case_path}`: Elevator {i} did not match")
-                print(e1, dump_elevator_data(e2, ppl_in_elvt))
+    def report(self) -> str:
+        lines = [f"`{self.test_case_path}` ({self.algorithm}): {'passed' if self.passed else 'FAILED'}"]
+        if self.error is not None:
+            lines.append(f"  crashed: {self.error}")
+        for rn, kind, i, expected, got in self.diffs:
+            lines.append(f"  round {rn}: {kind} {i} did not match; expected: {expected}, got: {got}")
+        return "\n".join(lines)
 
-                s.visualizer.wait_for_exit()
-                return
 
-        # Checking passengers
-        for i, (p1, p2) in enumerate(zip(round_["people"], gen.arrived_people)):
-            if p1 != dump_person_data(p2, ppl_in_elvt):
-                print(
-                    f"Error in round {rn} for test case `{test_case_path}`: Elevator {i} did not match")
-                print(p1, dump_elevator_data(p2, ppl_in_elvt))
+def check_round(round_num, round_, sim, gen, indices=None):
+    """Returns every (round_num, kind, index, expected, got) mismatch between the recorded round and the simulation
+
+    Only the people at indices (in arrived_people) are checked if it's given.
+    """
+    diffs = []
+
+    ppl_in_elvt = passenger_index(sim.elevators)
+
+    # Checking elevators
+    for i, (e1, e2) in enumerate(zip(round_["elevators"], sim.elevators)):
+        if e1 != (got := dump_elevator_data(e2, ppl_in_elvt)):
+            diffs.append((round_num, "elevator", i, e1, got))
+
+    # Checking passengers
+    if len(round_["people"]) != len(gen.arrived_people):
+        diffs.append((round_num, "people count", None, len(round_["people"]), len(gen.arrived_people)))
+
+    n = min(len(round_["people"]), len(gen.arrived_people))
+    for i in range(n) if indices is None else [i for i in indices if i < n]:
+        if (p1 := round_["people"][i]) != (got := dump_person_data(gen.arrived_people[i], ppl_in_elvt)):
+            diffs.append((round_num, "person", i, p1, got))
+
+    return diffs
+
+
+def _mark_last(iterable):
+    # Yields (item, is it the last one)
+    it = iter(iterable)
+    try:
+        prev = next(it)
+    except StopIteration:
+        return
+
+    for i in it:
+        yield prev, False
+        prev = i
+    yield prev, True
+
+
+def _file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _module_hash(name) -> str:
+    """Returns the hash of the source file of an imported module, "" if it doesn't have one"""
+    source = getattr(sys.modules.get(name), "__file__", None)
+    return _file_hash(source) if source else ""
+
+
+class CheckpointStore:
+    """Saves the Simulation and TestCaseGenerator every so many rounds so a long test case can be resumed later instead
+    of replayed from round 0
+
+    Checkpoints live in folder/<test case hash>_<algorithm>_<code hash>/<round_num>.pkl. The code hash covers every
+    module in SOURCES plus the file the algorithm is defined in, and the algorithm's pickled state, so editing your
+    algorithm, the simulation, the people/elevators or the visualizer (or the test case, or configuring the algorithm
+    differently) never resumes from a stale checkpoint.
+    """
+
+    # Everything whose objects end up in a checkpoint (a1_visualizer has Direction and the sprites people and elevators
+    # are made from, this module has TestCaseGenerator)
+    SOURCES = ("a1_visualizer", "a1_entities", "a1_algorithms", "a1_simulation", __name__)
+
+    def __init__(self, folder=".checkpoints"):
+        self.folder = folder
+
+    def key(self, test_case_path, moving_algorithm) -> str:
+        cls = type(moving_algorithm)
+
+        h = hashlib.sha256()
+        for module in dict.fromkeys(self.SOURCES + (cls.__module__,)):
+            h.update(f"{module}:{_module_hash(module)}".encode())
+        h.update(pickle.dumps(moving_algorithm))
+
+        return f"{_file_hash(test_case_path)[:16]}_{cls.__name__}_{h.hexdigest()[:12]}"
+
+    def rounds(self, key) -> list[int]:
+        """Returns every round there's a checkpoint for, sorted"""
+        path = os.path.join(self.folder, key)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(i.removesuffix(".pkl")) for i in os.listdir(path) if i.endswith(".pkl"))
+
+    def save(self, key, round_num, sim, gen) -> None:
+        """Saves the state after round_num was simulated"""
+        os.makedirs(os.path.join(self.folder, key), exist_ok=True)
+        path = os.path.join(self.folder, key, f"{round_num}.pkl")
+
+        # The visualizer is never pickled (it can hold pygame state), and the profiler's wrapper isn't either
+        visualizer, algorithm = sim.visualizer, sim.moving_algorithm
+        sim.visualizer = None
+        if isinstance(algorithm, _CountingAlgorithm):
+            sim.moving_algorithm = algorithm._algorithm
+
+        try:
+            # sim and gen go in one pickle so the people they share stay the same objects
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump((sim, gen), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        finally:
+            sim.visualizer, sim.moving_algorithm = visualizer, algorithm
+
+    def load(self, key, before):
+        """Returns (round_num, sim, gen) for the latest checkpoint before round `before`, None if there isn't one"""
+        rounds = [i for i in self.rounds(key) if i < before]
+        if not rounds:
+            return None
+
+        with open(os.path.join(self.folder, key, f"{rounds[-1]}.pkl"), "rb") as f:
+            sim, gen = pickle.load(f)
+        return rounds[-1], sim, gen
+
+
+def test_simulation(test_case_path, moving_algorithm, fail_fast=True, profiler=None, quiet=False,
+                    checkpoint_every=None, resume_from=None, checkpoints=None) -> SimulationResult:
+    """Replays the test case with moving_algorithm
+
+    With fail_fast, the first mismatch is printed and the replay stops there (this is the interactive mode). Without
+    it, nothing is printed and every round is replayed so the result has every divergence in the trace. quiet stops at
+    the first mismatch like fail_fast, but without printing anything or waiting on the visualizer.
+
+    Pass a StageProfiler to time every stage of every round.
+
+    checkpoint_every saves a checkpoint every that many rounds, and resume_from starts from the latest checkpoint before
+    that round instead of round 0 (rounds before the checkpoint aren't checked again). Both use checkpoints, a
+    CheckpointStore that defaults to `.checkpoints/`.
+    """
+    result = SimulationResult(test_case_path, type(moving_algorithm).__name__)
+
+    if checkpoints is None and (checkpoint_every or resume_from is not None):
+        checkpoints = CheckpointStore()
+    key = checkpoints.key(test_case_path, moving_algorithm) if checkpoints is not None else None
+
+    # The rounds are streamed so that only the current round is ever in memory
+    with TestCaseReader(test_case_path) as reader:
+        gen = TestCaseGenerator()
+
+        config = dict(reader.config)
+        config["arrival_generator"] = gen
+        config["moving_algorithm"] = moving_algorithm
+        config["visualize"] = False
+
+        s = Simulation(config)
+
+        resumed_round = -1
+        if resume_from is not None and (checkpoint := checkpoints.load(key, resume_from)) is not None:
+            # The checkpoint has its own copy of the algorithm (with whatever state it had), only the visualizer is new
+            resumed_round, resumed, gen = checkpoint
+            resumed.visualizer = s.visualizer
+            s = resumed
+
+        if profiler is not None:
+            profiler.instrument(s)
+
+        stop_early = fail_fast or quiet
+
+        for (rn, arrivals, round_), last in _mark_last(reader):
+            if rn <= resumed_round:
+                continue
+
+            gen.feed(rn, arrivals)
+
+            # The test cases only dump data after the simulation is done
+            start = time.perf_counter()
+            run_sim(s, rn, profiler)
+            result.round_times[rn] = time.perf_counter() - start
+
+            # When stopping at the first mismatch, most rounds only check the people still in the building (which
+            # includes anyone who got off this round), since people who already got off shouldn't change. Everyone
+            # gets checked every so often, and on the last round, in case the simulation changes them anyway.
+            # Otherwise every round checks everyone, so the result has every divergence
+            if not stop_early or last or rn % FULL_CHECK_INTERVAL == 0:
+                diffs = check_round(rn, round_, s, gen)
+            else:
+                diffs = check_round(rn, round_, s, gen, list(gen.active))
+
+            gen.update_active(s)
+            result.diffs.extend(diffs)
+
+            if checkpoint_every and rn and rn % checkpoint_every == 0:
+                checkpoints.save(key, rn, s, gen)
+
+            if diffs and quiet:
+                return result
+            elif diffs and fail_fast:
+                _, kind, i, expected, got = diffs[0]
+                print(f"Error in round {rn} for test case `{test_case_path}`: {kind.capitalize()} {i} did not match")
+                print(expected, got)
 
                 s.visualizer.wait_for_exit()
-                return
+                return result
+
+    if fail_fast and not quiet:
+        print(f"The simulation passes `{test_case_path}`")
+    return result
+
+
+def discover_test_cases(folder="test_cases") -> list[str]:
+    """Returns every test case (.json or .json.gz) under folder (recursively), sorted so the run order is stable"""
+    found = []
+
+    for dir_path, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith((".json", ".json.gz")):
+                found.append(os.path.join(dir_path, name))
+
+    return sorted(found)
+
+
+def _run_test_case(test_case_path, moving_algorithm):
+    # Runs inside a worker process, so it has to live at module level to be picklable
+    try:
+        return test_simulation(test_case_path, moving_algorithm, fail_fast=False)
+    except Exception as e:
+        result = SimulationResult(test_case_path, type(moving_algorithm).__name__)
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+
+
+class ResultCache:
+    """Keeps the SimulationResult of every (test case, algorithm) pair on disk, so run_test_cases can skip pairs where
+    neither the test case nor the code changed
+
+    Entries are keyed by the hash of the test case file, the algorithm (its class and its pickled state, so
+    differently configured instances don't share results) and the hashes of every module in SOURCES and the file the
+    algorithm is defined in. Once the folder is over max_bytes, the least recently used entries are deleted (file
+    modification times double as the access times).
+    """
+
+    # The simulation (a1_visualizer has Direction and the sprites), and the code that reads and checks test cases (this
+    # module and trace_io)
+    SOURCES = ("a1_visualizer", "a1_entities", "a1_algorithms", "a1_simulation", "trace_io", __name__)
+
+    def __init__(self, folder=".result_cache", max_bytes=64 << 20):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._source_hashes = {}
+
+    def _source_hash(self, module) -> str:
+        # Hashed once per module, the code can't change under a running process
+        if module not in self._source_hashes:
+            self._source_hashes[module] = _module_hash(module)
+        return self._source_hashes[module]
+
+    def key(self, test_case_path, moving_algorithm) -> str:
+        cls = type(moving_algorithm)
+        h = hashlib.sha256(_file_hash(test_case_path).encode())
+
+        for module in dict.fromkeys(self.SOURCES + (cls.__module__,)):
+            h.update(f"{module}:{self._source_hash(module)}".encode())
+        h.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+        h.update(pickle.dumps(moving_algorithm))
+
+        return h.hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.folder, key + ".pkl")
+
+    def get(self, key):
+        """Returns the cached SimulationResult, None if there isn't one"""
+        try:
+            with open(self._path(key), "rb") as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        os.utime(self._path(key))  # Counts as a use for the LRU
+        return result
+
+    def put(self, key, result) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self._path(key) + ".tmp", "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(self._path(key) + ".tmp", self._path(key))
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Deletes the least recently used entries until the folder is under max_bytes"""
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.folder, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(i[1] for i in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.folder, name))
+            total -= size
+
+    def clear(self) -> None:
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+
+
+def run_test_cases(test_cases, workers=None, cache=None) -> list[SimulationResult]:
+    """Runs every (test case path, moving_algorithm) pair over a process pool
+
+    Returns the results in the same order as test_cases. Nothing blocks on a mismatch, so this is safe to run
+    unattended. `workers` defaults to the number of cores. With a ResultCache, pairs whose test case and code haven't
+    changed since they were last run are reported from the cache instead of being replayed.
+    """
+    test_cases = list(test_cases)
+    results = [None] * len(test_cases)
+    keys = [cache.key(path, algorithm) for path, algorithm in test_cases] if cache is not None else []
+
+    for i, key in enumerate(keys):
+        if (result := cache.get(key)) is not None:
+            result.cached = True
+            results[i] = result
+
+    todo = [i for i, result in enumerate(results) if result is None]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(_run_test_case, *test_cases[i]) for i in todo}
+            for i, f in futures.items():
+                results[i] = f.result()
+
+                # Crashes aren't cached, they could be the machine's fault (out of memory, ...) rather than the code's
+                if cache is not None and results[i].error is None:
+                    cache.put(keys[i], results[i])
+
+    _print_results(results, len(results) - len(todo))
+    return results
+
+
+def _print_results(results, cached=0):
+    passed = sum(1 for i in results if i.passed)
+    for i in results:
+        if not i.passed:
+            print(i.report())
+
+    print(f"{passed}/{len(results)} test cases passed" + (f" ({cached} from cache)" if cached else ""))
+
+
+# In dependency order (a1_visualizer has Direction and the sprites, which everything else imports), so every module is
+# reloaded after the ones it imports and picks up their new classes. The algorithm modules get reloaded after these
+_WATCHED_MODULES = ("a1_visualizer", "a1_entities", "a1_algorithms", "a1_simulation")
+
+def _source_files(modules) -> dict[str, str]:
+    """Returns {module: source file} for the modules that are imported and have one"""
+    files = {}
+    for name in modules:
+        path = getattr(sys.modules.get(name), "__file__", None)
+        if path:
+            files[name] = path
+    return files
+
+
+# Source file -> mtime this process loaded it at, see _reload_changed. Taken at import time so a worker that gets
+# started after an edit still knows its modules are old
+_loaded_sources = {path: os.stat(path).st_mtime_ns for path in _source_files(_WATCHED_MODULES).values()}
+
+
+def _reload_changed(extra_modules):
+    """Reloads every a1_* module (and the algorithm modules) if any of their files changed since this process last
+    loaded them, then points this module at the new classes"""
+    modules = tuple(dict.fromkeys(_WATCHED_MODULES + tuple(extra_modules)))
+    files = _source_files(modules)
+
+    changed = False
+    for path in files.values():
+        mtime = os.stat(path).st_mtime_ns
+        changed |= _loaded_sources.setdefault(path, mtime) != mtime
+        _loaded_sources[path] = mtime
+
+    if not changed:
+        return
+
+    # Anything that imports a changed module keeps the old version unless it is reloaded too, so reload all of them (in
+    # _WATCHED_MODULES order, then the algorithm modules)
+    for name in files:
+        importlib.reload(sys.modules[name])
+
+    global Person, Simulation
+    Person = sys.modules["a1_entities"].Person
+    Simulation = sys.modules["a1_simulation"].Simulation
+
+
+def _run_watched(test_case_path, algorithm_module, pickled_algorithm):
+    # The algorithm is unpickled after the reload, otherwise it would be an instance of the old class
+    _reload_changed((algorithm_module,))
+    return _run_test_case(test_case_path, pickle.loads(pickled_algorithm))
+
+
+def _ignore_sigint():
+    # Runs in every watch worker, so Ctrl+C only stops the parent instead of printing a traceback per worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-    print(f"The simulation passes `{test_case_path}`")
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def watch(test_cases, algorithms=(), folder="test_cases", workers=None, interval=0.5):
+    """Stays running and re-runs test cases as soon as something they depend on changes, until Ctrl+C
+
+    Editing a test case re-runs it, editing the file an algorithm is in re-runs the test cases that use that algorithm,
+    and editing any other a1_* file re-runs everything. New test cases that show up in folder get run with every
+    algorithm in algorithms. The worker processes are kept between runs (and reload the changed modules themselves),
+    so nothing pays for starting python or importing pygame again.
+
+    Changes are found by polling the modification times every interval seconds.
+    """
+    pairs = list(test_cases)
+    known = set(discover_test_cases(folder)) if os.path.isdir(folder) else set()
+
+    def module_of(algorithm):
+        return type(algorithm).__module__
+
+    def sources():
+        return _source_files(_WATCHED_MODULES + tuple(module_of(i[1]) for i in pairs))
+
+    def snapshot():
+        # path -> (mtime, size) for every test case and source file
+        paths = list(dict.fromkeys(i[0] for i in pairs)) + list(sources().values())
+        return {path: _stat(path) for path in paths}
+
+    def run(todo):
+        futures = [pool.submit(_run_watched, path, module_of(algorithm), pickle.dumps(algorithm))
+                   for path, algorithm in todo]
+        print(f"--- {time.strftime('%H:%M:%S')}: running {len(todo)} test case{'s' if len(todo) != 1 else ''}")
+        _print_results([f.result() for f in futures])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint) as pool:
+        seen = snapshot()
+        run(pairs)
+
+        try:
+            while True:
+                time.sleep(interval)
+
+                # New test cases get paired with every algorithm, deleted ones are dropped
+                if os.path.isdir(folder):
+                    found = set(discover_test_cases(folder))
+                    pairs = [i for i in pairs if i[0] not in known - found]
+                    pairs.extend((path, algorithm) for path in sorted(found - known) for algorithm in algorithms)
+                    known = found
+
+                current = snapshot()
+                changed = {path for path, st in current.items() if seen.get(path) != st}
+                seen = current
+
+                changed_modules = {name for name, path in sources().items() if path in changed}
+                # A change to anything that isn't an algorithm's own module (like a1_simulation) affects everything
+                everything = bool(changed_modules - {module_of(i[1]) for i in pairs})
+
+                todo = [(path, algorithm) for path, algorithm in pairs
+                        if everything or path in changed or module_of(algorithm) in changed_modules]
+                if todo:
+                    run(todo)
+        except KeyboardInterrupt:
+            # Don't wait for whatever was still queued
+            pool.shutdown(cancel_futures=True)
 
 
 if __name__ == "__main__":
-    test_simulation("test_cases/test_case_0.json", FurthestFloor())
-    test_simulation("test_cases/test_case_1.json", EndToEndLoop())
-    test_simulation("test_cases/test_case_2.json", FurthestFloor())
-    test_simulation("test_cases/test_case_3.json", FurthestFloor())
+    run_test_cases([
+        ("test_cases/test_case_0.json", FurthestFloor()),
+        ("test_cases/test_case_1.json", EndToEndLoop()),
+    ])
+
+    # Or keep it running and re-run test cases whenever they or your code change
+    # watch([(i, FurthestFloor()) for i in discover_test_cases()], algorithms=[FurthestFloor(), EndToEndLoop()])
+
+    # Or skip the test cases that haven't changed since the last run (and neither has your code)
+    # run_test_cases([("test_cases/test_case_0.json", FurthestFloor())], cache=ResultCache())
+
+    # Or see where the time goes in one test case
+    # profiler = StageProfiler()
+    # test_simulation("test_cases/test_case_0.json", FurthestFloor(), profiler=profiler)
+    # print(profiler.summary())
+    # profiler.to_csv("profile.csv")
+
+    # Or save checkpoints on a long test case, then start close to the round that fails
+    # test_simulation("test_cases/test_case_0.json", FurthestFloor(), checkpoint_every=1000)
+    # test_simulation("test_cases/test_case_0.json", FurthestFloor(), resume_from=15000)
+
+    # Or run every test case in the folder against one algorithm
+    # run_test_cases([(i, FurthestFloor()) for i in discover_test_cases()], workers=4)
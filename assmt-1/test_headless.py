@@ -0,0 +1,42 @@
+"""Checks that the null pygame in headless.py doesn't change how the classes built on it behave
+
+    python -m pytest test_headless.py
+"""
+
+import pytest
+
+import headless
+
+if not headless.install_null_pygame():
+    pytest.skip("the real pygame is already imported", allow_module_level=True)
+
+import pygame
+
+
+class Person(pygame.sprite.Sprite):
+    def __init__(self, target):
+        pygame.sprite.Sprite.__init__(self)
+        self.target = target
+
+
+def test_sprite_subclass_is_a_plain_class():
+    p = Person(3)
+
+    assert p.target == 3
+    assert not hasattr(p, "direction")
+    with pytest.raises(AttributeError):
+        p.tagret
+
+    for f in (list, len, lambda i: i(), lambda i: i + 1, lambda i: [10, 20][i]):
+        with pytest.raises(TypeError):
+            f(p)
+
+
+def test_module_attributes_are_still_null():
+    screen = pygame.display.set_mode((100, 100))
+    screen.fill((255, 255, 255))
+    pygame.draw.rect(screen, (0, 0, 0), pygame.Rect(0, 0, 10, 10))
+
+    group = pygame.sprite.Group(Person(1))
+    group.draw(screen)
+    assert len(group) == 0
@@ -0,0 +1,62 @@
+"""Checks the parts of test_case_tester.py that don't need a test case of your own
+
+    python -m pytest test_test_case_tester.py
+"""
+
+import os
+import pickle
+import sys
+
+import pytest
+
+import headless
+
+headless.install_null_pygame()
+pytest.importorskip("a1_simulation")
+
+import test_case_tester
+
+TEST_CASE = os.path.join(os.path.dirname(__file__), "test_cases", "test_case_0.json")
+
+
+def _touch(path):
+    # A second later than before, so it counts as an edit however coarse the file system's mtimes are
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    return st
+
+
+@pytest.mark.parametrize("edited", test_case_tester._WATCHED_MODULES)
+def test_watched_pair_still_passes_after_an_edit(edited):
+    def run():
+        # Looked up every time, an earlier reload replaces the class
+        algorithm = sys.modules["a1_algorithms"].FurthestFloor()
+        return test_case_tester._run_watched(TEST_CASE, "a1_algorithms", pickle.dumps(algorithm))
+
+    assert run().passed
+
+    path = sys.modules[edited].__file__
+    st = _touch(path)
+    try:
+        result = run()
+    finally:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert result.passed, result.report()
+    # Every module has to have picked up the reloaded Direction, not just the ones reloaded after a1_visualizer
+    direction = sys.modules["a1_visualizer"].Direction
+    for name in ("a1_entities", "a1_algorithms", "a1_simulation"):
+        assert getattr(sys.modules[name], "Direction", direction) is direction, name
+
+
+class Configured:
+    def __init__(self, k):
+        self.k = k
+
+
+@pytest.mark.parametrize("store", [test_case_tester.ResultCache, test_case_tester.CheckpointStore])
+def test_key_covers_the_algorithm_state(tmp_path, store):
+    store = store(str(tmp_path))
+
+    assert store.key(TEST_CASE, Configured(1)) == store.key(TEST_CASE, Configured(1))
+    assert store.key(TEST_CASE, Configured(1)) != store.key(TEST_CASE, Configured(2))
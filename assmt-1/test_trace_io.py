@@ -0,0 +1,40 @@
+"""Checks that test cases read the same however the file gets split into chunks
+
+    python -m pytest test_trace_io.py
+"""
+
+import io
+import json
+
+import pytest
+
+import trace_io
+from trace_io import _JsonStream, write_test_case
+
+NUMBERS = "[12.5, 3e2, 7, -0.25, 1E-3, 4.5e+1, 0]"
+
+
+@pytest.mark.parametrize("chunk_size", range(1, len(NUMBERS) + 2))
+def test_numbers_split_between_chunks(chunk_size):
+    stream = _JsonStream(io.StringIO(NUMBERS), chunk_size)
+    assert list(stream.elements()) == json.loads(NUMBERS)
+
+
+@pytest.mark.parametrize("delta", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 9, 64])
+def test_reader_with_small_chunks(tmp_path, chunk_size, delta):
+    data = {
+        "config": {"num_floors": 4, "num_elevators": 1, "elevator_capacity": 2},
+        "arrivals": {"1": [[1, 3]], "2": [[4, 2]]},
+        "rounds": {
+            "1": {"elevators": [[1, []]], "people": [[1, 3, 0, False]]},
+            "2": {"elevators": [[2, [[1, 3, 1, True]]]], "people": [[1, 3, 1, True], [4, 2, 0, False]]},
+        },
+    }
+    path = str(tmp_path / ("case.delta.json.gz" if delta else "case.json"))
+    write_test_case(data, path, delta)
+
+    # Not imported by name, pytest would try to collect TestCaseReader
+    with trace_io.TestCaseReader(path, chunk_size) as reader:
+        assert reader.config == data["config"]
+        assert [(rn, round_) for rn, _, round_ in reader] == [(int(k), v) for k, v in data["rounds"].items()]
@@ -0,0 +1,182 @@
+"""Generates random test cases in bulk
+
+People arrive at random, and the expected rounds are filled in by a reference version of the assignment's moving
+algorithms driving a HeadlessBuilder, so the output is exactly what you would get by clicking it out by hand:
+- Disembarking: everyone whose target is the elevator's floor gets off
+- Boarding: people get on in the order they arrived, filling elevators in order (elevator 0 first)
+- FurthestFloor: an empty elevator heads for the furthest floor with someone waiting, otherwise it heads for the
+  furthest target of its passengers. Ties go to the lower floor, and it stays put if there's nowhere to go
+- EndToEndLoop: every elevator starts going up and turns around at the top and bottom floors
+- Wait times go up by 1 at the end of each round for everyone who hasn't gotten off yet
+
+If a generated test case fails and you're sure your code follows the handout, double check the reference above.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+
+from headless_builder import HeadlessBuilder, Phase
+from trace_io import write_test_case
+
+UP = 1
+STAY = 0
+DOWN = -1
+
+
+class ReferenceFurthestFloor:
+    def move_elevators(self, elevators, waiting, num_floors) -> list[int]:
+        directions = []
+
+        for e in elevators:
+            if e.passengers:
+                floors = [p.target for p in e.passengers]
+            else:
+                floors = [floor for floor, people in waiting.items() if people]
+
+            if not floors:
+                directions.append(STAY)
+                continue
+
+            # Furthest away, lower floor wins ties
+            best = max(floors, key=lambda f: (abs(f - e.current_floor), -f))
+
+            if best > e.current_floor:
+                directions.append(UP)
+            elif best < e.current_floor:
+                directions.append(DOWN)
+            else:
+                directions.append(STAY)
+
+        return directions
+
+
+class ReferenceEndToEndLoop:
+    def __init__(self):
+        self._directions = {}
+
+    def move_elevators(self, elevators, waiting, num_floors) -> list[int]:
+        directions = []
+
+        for i, e in enumerate(elevators):
+            direction = self._directions.get(i, UP)
+
+            if e.current_floor == num_floors:
+                direction = DOWN
+            elif e.current_floor == 1:
+                direction = UP
+
+            self._directions[i] = direction
+            directions.append(direction)
+
+        return directions
+
+
+REFERENCE_ALGORITHMS = {
+    "FurthestFloor": ReferenceFurthestFloor,
+    "EndToEndLoop": ReferenceEndToEndLoop,
+}
+
+
+def simulate_arrivals(num_floors, num_elevators, elevator_capacity, arrivals, num_rounds, algorithm="FurthestFloor") -> dict:
+    """Returns the full test case for the given arrivals ({round_num: [(from, target)]}) under the reference
+    algorithm"""
+    moving_algorithm = REFERENCE_ALGORITHMS[algorithm]()
+    b = HeadlessBuilder(num_floors, num_elevators, elevator_capacity, auto_increase_wait=True, enforce_phase=True)
+
+    waiting = {floor: [] for floor in range(1, num_floors + 1)}
+
+    for rn in range(num_rounds):
+        # Stage 1: elevator disembarking (round 0 starts in the arrival phase)
+        if b.phase is Phase.DISEMBARK:
+            for e in b.elevators:
+                for p in [p for p in e.passengers if p.target == e.current_floor]:
+                    b.disembark(p)
+            b.next_phase()
+
+        # Stage 2: new arrivals
+        for start, target in arrivals.get(rn, []):
+            waiting[start].append(b.add_person(start, target))
+        b.next_phase()
+
+        # Stage 3: elevator boarding
+        for e in b.elevators:
+            people = waiting[e.current_floor]
+            while people and len(e.passengers) < e.capacity:
+                b.board(people.pop(0), e)
+        b.next_phase()
+
+        # Stage 4: move the elevators
+        for e, direction in zip(b.elevators, moving_algorithm.move_elevators(b.elevators, waiting, num_floors)):
+            if direction == UP:
+                b.move_up(e)
+            elif direction == DOWN:
+                b.move_down(e)
+
+        # Stage 5: update wait times (auto_increase_wait) and save the round
+        b.next_round()
+
+    return b.data
+
+
+def random_arrivals(num_floors, num_rounds, rng, max_arrivals=2) -> dict[int, list[tuple[int, int]]]:
+    """Returns between 0 and max_arrivals random arrivals for each round"""
+    arrivals = {}
+
+    for rn in range(num_rounds):
+        for _ in range(rng.randint(0, max_arrivals)):
+            start, target = rng.sample(range(1, num_floors + 1), 2)
+            arrivals.setdefault(rn, []).append((start, target))
+
+    return arrivals
+
+
+def generate_trace(num_floors, num_elevators, elevator_capacity, seed, num_rounds, algorithm="FurthestFloor",
+                   max_arrivals=2) -> dict:
+    """Returns a random test case. The same arguments always give the same test case"""
+    rng = random.Random(seed)
+    arrivals = random_arrivals(num_floors, num_rounds, rng, max_arrivals)
+
+    return simulate_arrivals(num_floors, num_elevators, elevator_capacity, arrivals, num_rounds, algorithm)
+
+
+def _write_trace(path, delta, *args):
+    # Runs inside a worker process
+    write_test_case(generate_trace(*args), path, delta=delta)
+    return path
+
+
+def generate_corpus(count, num_floors, num_elevators, elevator_capacity, num_rounds, algorithm="FurthestFloor",
+                    seed=0, max_arrivals=2, out_dir="test_cases", workers=None, delta=False) -> list[str]:
+    """Writes count random test cases (seeds seed, seed + 1, ...) to out_dir over a process pool
+
+    Files are named gen_<algorithm>_<seed>.json so they can be paired back up with the right algorithm, e.g.
+    `[(i, FurthestFloor()) for i in discover_test_cases() if "FurthestFloor" in i]`. Returns the paths written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ext = ".delta.json.gz" if delta else ".json"
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_write_trace, os.path.join(out_dir, f"gen_{algorithm}_{s}{ext}"), delta,
+                        num_floors, num_elevators, elevator_capacity, s, num_rounds, algorithm, max_arrivals)
+            for s in range(seed, seed + count)
+        ]
+        return [f.result() for f in futures]
+
+
+if __name__ == "__main__":
+    num_floors = 5
+    num_elevators = 2
+    elevator_capacity = 3
+
+    num_rounds = 50
+    # How many people can show up in a single round
+    max_arrivals = 2
+
+    paths = generate_corpus(100, num_floors, num_elevators, elevator_capacity, num_rounds, "FurthestFloor",
+                            max_arrivals=max_arrivals)
+    paths += generate_corpus(100, num_floors, num_elevators, elevator_capacity, num_rounds, "EndToEndLoop",
+                             max_arrivals=max_arrivals)
+
+    print(f"Generated {len(paths)} test cases")
@@ -0,0 +1,365 @@
+"""Reads and writes test case files one round at a time so huge traces never have to fit in memory
+
+Test case files look like this (see ControlGrid in test_case_builder.py):
+{
+  "config": {...},
+  "arrivals": {round_num: [(from, target)]},
+  "rounds": {round_num: {"elevators": [...], "people": [...]}}
+}
+
+`arrivals` is small (one entry per person) so it is read in one go, but `rounds` is where all the size is, so it is
+parsed round by round. This relies on `arrivals` coming before `rounds`, which is always the case for files written
+by the test case builder.
+
+There is also a compact "delta" format that only stores what changed each round instead of a full snapshot:
+{
+  "format": "delta",
+  "config": {...},
+  "arrivals": {round_num: [(from, target)]},
+  "rounds": [
+    {
+      "round": round_num,
+      "elevators": [(elevator_num, floor, [person_num])],  # Only elevators that moved or had people get on/off
+      "tick": [person_num],  # People whose wait time went up by 1
+      "waits": [(person_num, wait_time)]  # Any other wait time change
+    }
+  ]
+}
+People are numbered in the order they arrive, which is the same order as the snapshot's "people" list. Anything
+ending in `.gz` is gzipped. The reader rebuilds the full snapshots for delta files as it goes, so callers can't tell
+the difference.
+"""
+
+import gzip
+import json
+
+
+def open_test_case(path, mode="r"):
+    """Opens a test case file as text, going through gzip if it ends in `.gz`"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t")
+    return open(path, mode)
+
+
+# What can come right after a number that has ended
+_AFTER_NUMBER = frozenset(" \t\r\n,]}")
+
+
+class _JsonStream:
+    """Pulls json values out of a file one at a time instead of parsing the whole file"""
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        # Drop everything that was already consumed. Reading at least as much as we are holding keeps a single big
+        # value (like a huge arrivals dict) linear instead of re-parsing it once per chunk
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+
+        chunk = self._f.read(max(self._chunk_size, len(self._buf)))
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non whitespace character without consuming it ("" at the end of the file)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            elif not self._fill():
+                return ""
+
+    def expect(self, char):
+        if (c := self.peek()) != char:
+            raise ValueError(f"Malformed test case file: expected {char!r}, got {c!r}")
+        self._pos += 1
+
+    def value(self):
+        """Parses and consumes the next json value"""
+        self.peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A value right at the end of the buffer might keep going in the next chunk, and so might a number that
+            # isn't followed by a delimiter (the chunk can end in the middle of it, like "12." + "5" or "3" + "e2")
+            if (end == len(self._buf) or isinstance(value, (int, float)) and self._buf[end] not in _AFTER_NUMBER) \
+                    and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def keys(self):
+        """Yields each key of the object at the current position. The caller has to consume the value before the
+        next key is read"""
+        self.expect("{")
+
+        if self.peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(":")
+
+            yield key
+
+            c = self.peek()
+            self._pos += 1
+            if c == "}":
+                return
+            elif c != ",":
+                raise ValueError(f"Malformed test case file: expected ',' or '}}', got {c!r}")
+
+    def elements(self):
+        """Yields each value of the array at the current position"""
+        self.expect("[")
+
+        if self.peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield self.value()
+
+            c = self.peek()
+            self._pos += 1
+            if c == "]":
+                return
+            elif c != ",":
+                raise ValueError(f"Malformed test case file: expected ',' or ']', got {c!r}")
+
+
+class DeltaEncoder:
+    """Turns full round snapshots into deltas, one round at a time
+
+    Snapshots don't say which person is on which elevator, only their values, so passengers are matched to people
+    with the same values. People with identical values are interchangeable, so any match rebuilds the same snapshot.
+    """
+
+    def __init__(self, num_elevators):
+        self._floors = [1] * num_elevators
+        self._passengers = [[] for _ in range(num_elevators)]
+        self._waits = []
+
+    def add_round(self, round_num, snapshot) -> dict:
+        people = snapshot["people"]
+        self._waits.extend([0] * (len(people) - len(self._waits)))
+
+        riders = {}
+        for i, p in enumerate(people):
+            if p[3]:
+                riders.setdefault(tuple(p), []).append(i)
+
+        delta = {"round": round_num, "elevators": [], "tick": [], "waits": []}
+
+        for e, (floor, passengers) in enumerate(snapshot["elevators"]):
+            prev = self._passengers[e]
+            curr = []
+
+            for p in passengers:
+                if not (candidates := riders.get(tuple(p))):
+                    raise ValueError(f"Round {round_num}: elevator {e} has a passenger {p} who isn't in people")
+
+                # Keep people on the elevator they were on so elevators that didn't change stay out of the delta
+                i = next((j for j in candidates if j in prev), candidates[0])
+                candidates.remove(i)
+                curr.append(i)
+
+            if floor != self._floors[e] or curr != prev:
+                delta["elevators"].append([e, floor, curr])
+                self._floors[e] = floor
+                self._passengers[e] = curr
+
+        if any(riders.values()):
+            raise ValueError(f"Round {round_num}: someone is on an elevator but no elevator has them")
+
+        for i, p in enumerate(people):
+            if p[2] == self._waits[i] + 1:
+                delta["tick"].append(i)
+            elif p[2] != self._waits[i]:
+                delta["waits"].append([i, p[2]])
+            self._waits[i] = p[2]
+
+        return delta
+
+
+class _DeltaState:
+    """Current state of a delta file being replayed"""
+
+    def __init__(self, num_elevators):
+        self.people = []  # [start, target]
+        self.waits = []
+        self.floors = [1] * num_elevators
+        self.passengers = [[] for _ in range(num_elevators)]
+
+    def apply(self, delta, arrivals):
+        for start, target in arrivals:
+            self.people.append((start, target))
+            self.waits.append(0)
+
+        for e, floor, passengers in delta["elevators"]:
+            self.floors[e] = floor
+            self.passengers[e] = passengers
+
+        for i in delta["tick"]:
+            self.waits[i] += 1
+
+        for i, wait in delta["waits"]:
+            self.waits[i] = wait
+
+    def snapshot(self) -> dict:
+        riders = {i for passengers in self.passengers for i in passengers}
+
+        def dump(i):
+            return [*self.people[i], self.waits[i], i in riders]
+
+        return {
+            "elevators": [[floor, [dump(i) for i in passengers]] for floor, passengers in zip(self.floors, self.passengers)],
+            "people": [dump(i) for i in range(len(self.people))]
+        }
+
+
+def encode_delta(data) -> dict:
+    """Returns the delta format of a full test case"""
+    encoder = DeltaEncoder(data["config"]["num_elevators"])
+
+    return {
+        "format": "delta",
+        "config": data["config"],
+        "arrivals": data["arrivals"],
+        "rounds": [encoder.add_round(int(rn), round_) for rn, round_ in data["rounds"].items()]
+    }
+
+
+def write_test_case(data, path, delta=False):
+    """Writes a full test case to path, in the delta format if delta is set"""
+    with open_test_case(path, "w") as f:
+        if delta:
+            json.dump(encode_delta(data), f, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=2)
+
+
+def load_test_case(path) -> dict:
+    """Loads any test case file into the full format. This holds everything in memory, so only use it for small
+    files or converting between formats"""
+    with TestCaseReader(path) as reader:
+        data = {"config": reader.config, "arrivals": {}, "rounds": {}}
+
+        for rn, arrivals, round_ in reader:
+            if arrivals:
+                data["arrivals"][str(rn)] = arrivals
+            data["rounds"][str(rn)] = round_
+
+        # Arrivals after the last round never get yielded
+        for rn, arrivals in reader.arrivals.items():
+            data["arrivals"][str(rn)] = arrivals
+
+    data["arrivals"] = dict(sorted(data["arrivals"].items(), key=lambda x: int(x[0])))
+    return data
+
+
+class TestCaseReader:
+    """Streams a test case file
+
+    `config` and `arrivals` (keyed by int round numbers) are available as soon as the reader is opened. Iterating it
+    yields (round_num, arrivals, expected_state) one round at a time, where arrivals are the (from, target) pairs that
+    arrive in that round and expected_state is the round's {"elevators": ..., "people": ...} dict. Delta files are
+    rebuilt into the same snapshots as they are read.
+    """
+
+    def __init__(self, path, chunk_size=1 << 16):
+        self.path = path
+
+        self._f = open_test_case(path)
+        self._stream = _JsonStream(self._f, chunk_size)
+        self._keys = self._stream.keys()
+
+        self.format = "full"
+        self.config = None
+        self.arrivals = None
+
+        # Read the header up to (but not including) the rounds
+        for key in self._keys:
+            if key == "rounds":
+                break
+            elif key == "config":
+                self.config = self._stream.value()
+            elif key == "arrivals":
+                self.arrivals = {int(k): v for k, v in self._stream.value().items()}
+            elif key == "format":
+                self.format = self._stream.value()
+            else:
+                self._stream.value()
+        else:
+            self._keys = None
+
+        if self.config is None:
+            raise ValueError(f"`{path}` has no config")
+        elif self.arrivals is None:
+            raise ValueError(f"`{path}` must have its arrivals before its rounds to be streamed")
+
+    def __iter__(self):
+        if self._keys is None:  # The file has no rounds
+            return
+
+        if self.format == "delta":
+            state = _DeltaState(self.config["num_elevators"])
+
+            for delta in self._stream.elements():
+                rn = delta["round"]
+                arrivals = self.arrivals.pop(rn, [])
+
+                state.apply(delta, arrivals)
+                yield rn, arrivals, state.snapshot()
+        else:
+            for rn in self._stream.keys():
+                rn = int(rn)
+                # Popping keeps memory flat since arrivals are only needed once
+                yield rn, self.arrivals.pop(rn, []), self._stream.value()
+
+        self._keys = None
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python trace_io.py <from> <to>")
+        print("Converts between formats, e.g. `python trace_io.py test_cases/test_case_0.json test_case_0.delta.json.gz`")
+        print("Anything with `.delta.` in its name is written in the delta format")
+        sys.exit(1)
+
+    write_test_case(load_test_case(sys.argv[1]), sys.argv[2], delta=".delta." in sys.argv[2])
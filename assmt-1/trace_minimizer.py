@@ -0,0 +1,199 @@
+"""Shrinks a failing test case down to a small one that still fails
+
+    python trace_minimizer.py test_cases/gen_FurthestFloor_3.json FurthestFloor
+
+First the rounds after the first mismatch are cut off (those can't matter). Then the arrivals are delta debugged: sets
+of people are removed, the expected rounds are rebuilt with the reference algorithm from trace_generator.py, and the
+smaller test case is kept if your algorithm still fails it. Every time a smaller one fails, the rounds after its first
+mismatch are cut off too. Candidates are replayed over a process pool, and anything that was already tried is never
+replayed again.
+
+Removing people only works if the reference algorithm gives the same expected rounds as the test case, so for test
+cases that were clicked out by hand (or with an algorithm that has no reference) only the rounds get cut.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import tempfile
+
+from test_case_tester import StageProfiler, test_simulation
+from trace_generator import REFERENCE_ALGORITHMS, simulate_arrivals
+from trace_io import load_test_case, write_test_case
+
+
+def _first_failure(test_case_path, moving_algorithm):
+    """Returns the first round moving_algorithm doesn't match (or crashes in), None if it passes. Runs inside a worker
+    process"""
+    # The profiler is only there so a crash can be traced back to the round it happened in
+    profiler = StageProfiler()
+
+    try:
+        result = test_simulation(test_case_path, moving_algorithm, profiler=profiler, quiet=True)
+    except Exception:
+        return profiler.rows[-1][0] if profiler.rows else 0
+
+    return result.diffs[0][0] if result.diffs else None
+
+
+def _replay(data, moving_algorithm):
+    # Same as _first_failure, for a test case that isn't on disk yet
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+
+    try:
+        write_test_case(data, path)
+        return _first_failure(path, moving_algorithm)
+    finally:
+        os.remove(path)
+
+
+def _split(items, n):
+    # n chunks that are as even as possible
+    size, extra = divmod(len(items), n)
+    chunks = []
+    start = 0
+
+    for i in range(n):
+        end = start + size + (i < extra)
+        chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
+class TraceMinimizer:
+    """Delta debugs the arrivals of a failing test case
+
+    arrivals are kept as a flat list of (round_num, from, target) and num_rounds is how many rounds get replayed. Both
+    only ever get smaller.
+    """
+
+    def __init__(self, test_case_path, moving_algorithm, reference=None, workers=None):
+        self.moving_algorithm = moving_algorithm
+        # The algorithm with the same name as moving_algorithm's class is used to rebuild the expected rounds
+        self.reference = reference or type(moving_algorithm).__name__
+        self.workers = workers
+
+        self.test_case_path = test_case_path
+        self.data = load_test_case(test_case_path)
+        self.config = self.data["config"]
+        self.arrivals = [(int(rn), start, target) for rn, i in self.data["arrivals"].items() for start, target in i]
+        self.num_rounds = len(self.data["rounds"])
+
+        # {(arrivals, num_rounds): failing round or None}
+        self.cache = {}
+        self.replays = 0
+
+    def build(self, arrivals, num_rounds) -> dict:
+        """Returns the test case for arrivals with the expected rounds from the reference algorithm"""
+        by_round = {}
+        for rn, start, target in arrivals:
+            by_round.setdefault(rn, []).append((start, target))
+
+        data = simulate_arrivals(self.config["num_floors"], self.config["num_elevators"],
+                                 self.config["elevator_capacity"], by_round, num_rounds, self.reference)
+        # Same layout as a dumped test case
+        data["arrivals"] = {str(rn): i for rn, i in data["arrivals"].items()}
+        data["rounds"] = {str(rn): i for rn, i in data["rounds"].items()}
+        return data
+
+    def truncated(self, num_rounds) -> dict:
+        """Returns the original test case cut down to its first num_rounds rounds"""
+        return {
+            "config": self.config,
+            "arrivals": {rn: i for rn, i in self.data["arrivals"].items() if int(rn) < num_rounds},
+            "rounds": {rn: i for rn, i in self.data["rounds"].items() if int(rn) < num_rounds},
+        }
+
+    def _try(self, pool, candidates) -> list:
+        """Returns the failing round (or None) of every list of arrivals in candidates, at the current num_rounds"""
+        keys = [(tuple(i), self.num_rounds) for i in candidates]
+        todo = list(dict.fromkeys(k for k in keys if k not in self.cache))
+
+        futures = [pool.submit(_replay, self.build(*k), self.moving_algorithm) for k in todo]
+        for k, f in zip(todo, futures):
+            self.cache[k] = f.result()
+        self.replays += len(todo)
+
+        return [self.cache[k] for k in keys]
+
+    def _cut(self, failing_round):
+        # Nothing after the first mismatch matters
+        if failing_round is not None:
+            self.num_rounds = min(self.num_rounds, failing_round + 1)
+            self.arrivals = [i for i in self.arrivals if i[0] < self.num_rounds]
+
+    def minimize(self) -> dict:
+        """Shrinks the test case and returns the smallest one that still fails"""
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            failing_round = pool.submit(_first_failure, self.test_case_path, self.moving_algorithm).result()
+            if failing_round is None:
+                raise ValueError("The test case doesn't fail, there's nothing to minimize")
+
+            self._cut(failing_round)
+            best = self.truncated(self.num_rounds)
+
+            if self.reference not in REFERENCE_ALGORITHMS:
+                print(f"No reference for {self.reference}, only cutting rounds")
+                return best
+
+            # The reference has to agree with the test case, otherwise shrinking would chase a different failure
+            if self._try(pool, [self.arrivals])[0] is None:
+                print(f"The reference {self.reference} doesn't reproduce the failure, only cutting rounds")
+                return best
+
+            n = 2
+            while len(self.arrivals) >= 2:
+                chunks = _split(self.arrivals, n)
+                complements = [[i for j, c in enumerate(chunks) if j != k for i in c] for k in range(n)] if n > 2 else []
+
+                candidates = chunks + complements
+                results = self._try(pool, candidates)
+
+                failed = next((k for k, r in enumerate(results) if r is not None), None)
+                if failed is None:
+                    if n >= len(self.arrivals):
+                        break
+                    n = min(n * 2, len(self.arrivals))
+                    continue
+
+                self.arrivals = candidates[failed]
+                self._cut(results[failed])
+                # Down to one chunk starts over, removing a single chunk keeps the granularity
+                n = 2 if failed < len(chunks) else max(n - 1, 2)
+
+            # One arrival (or none) left, see if it fails without anyone at all
+            if len(self.arrivals) == 1 and self._try(pool, [[]])[0] is not None:
+                self.arrivals = []
+
+            self._cut(self._try(pool, [self.arrivals])[0])
+
+        return self.build(self.arrivals, self.num_rounds)
+
+
+def minimize_test_case(test_case_path, moving_algorithm, out_path=None, reference=None, workers=None) -> str:
+    """Writes the smallest failing version of test_case_path to out_path (next to it by default) and returns the path"""
+    minimizer = TraceMinimizer(test_case_path, moving_algorithm, reference, workers)
+    before = (len(minimizer.arrivals), minimizer.num_rounds)
+
+    data = minimizer.minimize()
+
+    if out_path is None:
+        out_path = test_case_path.removesuffix(".gz").removesuffix(".json") + ".min.json"
+    write_test_case(data, out_path)
+
+    print(f"{before[0]} people / {before[1]} rounds -> {sum(len(i) for i in data['arrivals'].values())} people / "
+          f"{len(data['rounds'])} rounds ({minimizer.replays} replays), saved to `{out_path}`")
+    return out_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    from a1_algorithms import EndToEndLoop, FurthestFloor
+
+    if len(sys.argv) != 3:
+        print("Usage: python trace_minimizer.py <test case> <FurthestFloor|EndToEndLoop>")
+        sys.exit(1)
+
+    minimize_test_case(sys.argv[1], {"FurthestFloor": FurthestFloor, "EndToEndLoop": EndToEndLoop}[sys.argv[2]]())
@@ -0,0 +1,70 @@
+"""Checks the verifiers in tree_tester.py against trees built by hand
+
+    python -m pytest test_tree_tester.py
+"""
+
+import pytest
+
+pytest.importorskip("a2_prefix_tree")
+
+from tree_tester import verify_compressed_tree, verify_simple_tree_structure
+
+
+class Node:
+    """Just enough of a prefix tree for the verifiers"""
+
+    def __init__(self, root, weight, subtrees=()):
+        self.root = root
+        self.weight = weight
+        self.subtrees = list(subtrees)
+
+    def is_empty(self):
+        return self.weight == 0 and not self.subtrees
+
+    def is_leaf(self):
+        return self.weight > 0 and not self.subtrees
+
+
+def compressed_tree():
+    # abc, abd and xyz: ['a', 'b'] is shared, every other value's node only has its leaf
+    return Node([], 6.0, [
+        Node(["a", "b"], 3.0, [
+            Node(["a", "b", "c"], 1.0, [Node("abc", 1.0)]),
+            Node(["a", "b", "d"], 2.0, [Node("abd", 2.0)]),
+        ]),
+        Node(["x", "y", "z"], 3.0, [Node("xyz", 3.0)]),
+    ])
+
+
+INPT = [("abc", 1), ("abd", 2), ("xyz", 3)]
+
+
+def test_compressed_tree_passes():
+    assert verify_compressed_tree(compressed_tree(), INPT) == (True, None)
+
+
+def test_lone_internal_subtree_fails():
+    tree = compressed_tree()
+    # ['x'] -> ['x', 'y', 'z'] should have been one node
+    tree.subtrees[1] = Node(["x"], 3.0, [tree.subtrees[1]])
+
+    ok, message = verify_compressed_tree(tree, INPT)
+    assert not ok
+    assert message == "Internal Node(['x']) has only one subtree, it should have been compressed"
+
+
+def simple_tree():
+    # cat and car, 7 nodes
+    return Node([], 3.0, [
+        Node(["c"], 3.0, [
+            Node(["c", "a"], 3.0, [
+                Node(["c", "a", "t"], 1.0, [Node("cat", 1.0)]),
+                Node(["c", "a", "r"], 2.0, [Node("car", 2.0)]),
+            ]),
+        ]),
+    ])
+
+
+def test_max_nodes_covering_the_whole_tree():
+    assert verify_simple_tree_structure(simple_tree(), max_nodes=7) == (True, None)
+    assert verify_simple_tree_structure(simple_tree(), max_nodes=6) == (True, "Stopped after checking 6 nodes")
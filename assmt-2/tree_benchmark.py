@@ -0,0 +1,267 @@
+"""Benchmarks SimplePrefixTree against CompressedPrefixTree
+
+For every size in SIZES (up to --max-size), a corpus of that many words is loaded into each tree, and this times the
+bulk insert, autocomplete for every prefix length in PREFIX_LENGTHS and limit in LIMITS, and removing words one at a
+time. Every operation gets its throughput and p50/p99 latency, and every tree its node count and peak RSS (each tree
+and size is run in its own process, so the peak is only that tree's).
+
+    python tree_benchmark.py run -o before.json
+    python tree_benchmark.py run -o after.json --corpus words.txt --max-size 10000000
+    python tree_benchmark.py compare before.json after.json
+
+The corpus is random words by default, or a word list with one word per line (optionally followed by a weight).
+compare exits with 1 if anything got slower (or used more memory) by more than --threshold.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows, peak RSS just doesn't get recorded
+    resource = None
+
+from a2_prefix_tree import SimplePrefixTree, CompressedPrefixTree
+
+TREE_TYPES = {
+    "SimplePrefixTree": SimplePrefixTree,
+    "CompressedPrefixTree": CompressedPrefixTree,
+}
+
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+PREFIX_LENGTHS = [1, 2, 4, 8]
+LIMITS = [None, 10]
+
+# Letters are picked unevenly so that words share prefixes like real ones do
+LETTER_WEIGHTS = [1 / (i + 1) for i in range(26)]
+
+
+def synthetic_corpus(size, seed=0) -> list[tuple[str, float]]:
+    """Returns size random (word, weight) pairs"""
+    rnd = random.Random(seed)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+
+    return [("".join(rnd.choices(letters, LETTER_WEIGHTS, k=rnd.randint(3, 12))), float(rnd.randint(1, 100)))
+            for _ in range(size)]
+
+
+def load_corpus(path, size) -> list[tuple[str, float]]:
+    """Returns the first size (word, weight) pairs in the word list at path (weights default to 1)"""
+    corpus = []
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if len(corpus) >= size:
+                break
+
+            parts = line.split()
+            if parts:
+                corpus.append((parts[0], float(parts[1]) if len(parts) > 1 else 1.0))
+
+    return corpus
+
+
+def count_nodes(tree) -> int:
+    count = 0
+    stack = [tree]
+
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.subtrees)
+
+    return count
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _stats(latencies, total=None) -> dict:
+    """Throughput and latency percentiles (in ms) of one operation"""
+    latencies = sorted(latencies)
+    total = sum(latencies) if total is None else total
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+
+    return {
+        "count": len(latencies),
+        "ops_per_sec": len(latencies) / total if total else math.inf,
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def measure(tree_name, size, corpus_path=None, seed=0, num_queries=200) -> dict | None:
+    """Loads size words into a tree_name and times everything. Runs in its own process, see run"""
+    corpus = load_corpus(corpus_path, size) if corpus_path else synthetic_corpus(size, seed)
+    if len(corpus) < size:  # The word list is too short for this size
+        return None
+
+    rnd = random.Random(seed)
+    tree = TREE_TYPES[tree_name]()
+    ops = {}
+
+    # Bulk insert, timed as a whole too since per call timing adds up at this many calls
+    latencies = []
+    start = time.perf_counter()
+    for word, weight in corpus:
+        t = time.perf_counter()
+        tree.insert(word, weight, list(word))
+        latencies.append(time.perf_counter() - t)
+    ops["insert"] = _stats(latencies, time.perf_counter() - start)
+
+    nodes = count_nodes(tree)
+
+    for length in PREFIX_LENGTHS:
+        prefixes = [list(word[:length]) for word, _ in rnd.choices(corpus, k=num_queries)]
+
+        for limit in LIMITS:
+            latencies = []
+            for prefix in prefixes:
+                t = time.perf_counter()
+                tree.autocomplete(prefix) if limit is None else tree.autocomplete(prefix, limit)
+                latencies.append(time.perf_counter() - t)
+            ops[f"autocomplete/prefix={length}/limit={limit}"] = _stats(latencies)
+
+    latencies = []
+    for word, _ in rnd.sample(corpus, min(num_queries, len(corpus))):
+        t = time.perf_counter()
+        tree.remove(list(word))
+        latencies.append(time.perf_counter() - t)
+    ops["remove"] = _stats(latencies)
+
+    return {"tree": tree_name, "size": size, "nodes": nodes, "peak_rss_mb": _peak_rss_mb(), "ops": ops}
+
+
+def run(tree_names, sizes, corpus_path=None, seed=0, num_queries=200) -> dict:
+    results = []
+
+    for size, name in ((size, name) for size in sizes for name in tree_names):
+        # A new process every time so the peak RSS isn't left over from a bigger tree
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            m = pool.submit(measure, name, size, corpus_path, seed, num_queries).result()
+
+        if m is None:
+            print(f"The corpus has fewer than {size} words, stopping")
+            break
+
+        results.append(m)
+        rss = f"{m['peak_rss_mb']:>10.1f} MB" if m["peak_rss_mb"] is not None else ""
+        print(f"{name:<22}{size:>10}{m['nodes']:>12} nodes{rss}")
+        for op, s in m["ops"].items():
+            print(f"    {op:<36}{s['ops_per_sec']:>14.1f} ops/s  p50 {s['p50_ms']:.4f} ms  p99 {s['p99_ms']:.4f} ms")
+
+    # How many times faster the compressed tree is at everything (above 1 means it pays off)
+    speedups = {}
+    by_key = {(i["tree"], i["size"]): i for i in results}
+    for size in sorted({i["size"] for i in results}):
+        simple, compressed = by_key.get(("SimplePrefixTree", size)), by_key.get(("CompressedPrefixTree", size))
+        if simple and compressed:
+            speedups[size] = {op: compressed["ops"][op]["ops_per_sec"] / s["ops_per_sec"]
+                              for op, s in simple["ops"].items() if s["ops_per_sec"]}
+
+    if speedups:
+        print()
+        for size, ops in speedups.items():
+            print(f"CompressedPrefixTree vs SimplePrefixTree at {size}: "
+                  + ", ".join(f"{op} x{k:.2f}" for op, k in ops.items()))
+
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seed": seed,
+            "corpus": corpus_path or "synthetic",
+        },
+        "results": results,
+        "speedups": {str(size): ops for size, ops in speedups.items()},
+    }
+
+
+def compare(old, new, threshold=0.1) -> list[str]:
+    """Returns a line for everything in new that is more than threshold slower (or uses more memory) than in old"""
+    before = {(i["tree"], i["size"]): i for i in old["results"]}
+    regressions = []
+
+    for i in new["results"]:
+        key = (i["tree"], i["size"])
+        if key not in before:
+            continue
+
+        o = before[key]
+        for op, s in i["ops"].items():
+            if op not in o["ops"]:
+                continue
+
+            old_s = o["ops"][op]
+            if s["ops_per_sec"] < old_s["ops_per_sec"] * (1 - threshold):
+                regressions.append(f"{key} {op}: {old_s['ops_per_sec']:.1f} -> {s['ops_per_sec']:.1f} ops/s")
+            if s["p99_ms"] is not None and old_s["p99_ms"] is not None and s["p99_ms"] > old_s["p99_ms"] * (1 + threshold):
+                regressions.append(f"{key} {op}: p99 {old_s['p99_ms']:.4f} -> {s['p99_ms']:.4f} ms")
+
+        if i["peak_rss_mb"] is not None and o["peak_rss_mb"] is not None \
+                and i["peak_rss_mb"] > o["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key}: {o['peak_rss_mb']:.1f} -> {i['peak_rss_mb']:.1f} MB")
+        if i["nodes"] > o["nodes"]:
+            regressions.append(f"{key}: {o['nodes']} -> {i['nodes']} nodes")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prefix trees")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("-o", "--output", default="tree_benchmark.json")
+    run_parser.add_argument("--tree", action="append", choices=list(TREE_TYPES),
+                            help="Only benchmark this tree (can be given more than once)")
+    run_parser.add_argument("--corpus", help="Word list with one word (and optionally a weight) per line")
+    # The bigger sizes take a long time (and a lot of memory), so they're opt in
+    run_parser.add_argument("--max-size", type=int, default=10 ** 5)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--queries", type=int, default=200, help="Autocompletes/removes per measurement")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        data = run(args.tree or list(TREE_TYPES), [i for i in SIZES if i <= args.max_size], args.corpus, args.seed,
+                   args.queries)
+
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"Saved to `{args.output}`")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+
+        regressions = compare(old, new, args.threshold)
+        for i in regressions:
+            print(f"REGRESSION {i}")
+        print(f"{len(regressions)} regressions")
+
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Throws random inserts, removes and autocompletes at SimplePrefixTree and CompressedPrefixTree and compares them with
+a plain dict that does the same thing
+
+    python tree_fuzzer.py [number of workloads] [first seed]
+
+Every workload is made from its seed, so a failing seed always fails the same way. Words are made from a few stems
+(picked very unevenly, and some of them long) plus a short random ending, so there are lots of long shared prefixes and
+the same word gets inserted more than once. Workloads run over a process pool, and any that fail get shrunk down to the
+fewest operations that still fail before they're printed.
+
+Workloads are lists of operations:
+    ("insert", word, weight)
+    ("remove", prefix)
+    ("autocomplete", prefix, limit)  # limit can be None
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from math import isclose
+import random
+import sys
+
+from a2_prefix_tree import SimplePrefixTree, CompressedPrefixTree
+from tree_tester import TreeVerifier
+
+TREE_TYPES = (SimplePrefixTree, CompressedPrefixTree)
+
+# The whole tree gets verified every this many operations (and after the last one)
+VERIFY_INTERVAL = 500
+
+
+def generate_workload(seed: int, num_ops: int = 5000, alphabet: str = "abcde") -> list[tuple]:
+    """Returns num_ops random operations, the same ones every time for the same seed"""
+    rnd = random.Random(seed)
+
+    # A few stems get picked most of the time, and some are long, so most words share a long prefix with others
+    stems = ["".join(rnd.choice(alphabet) for _ in range(rnd.choice((1, 2, 3, 8, 20)))) for _ in range(20)]
+    stem_weights = [1 / (i + 1) ** 1.5 for i in range(len(stems))]
+
+    words = []
+    ops = []
+
+    for _ in range(num_ops):
+        kind = rnd.random()
+
+        if kind < 0.65:
+            # Duplicates add to the word's weight
+            if words and rnd.random() < 0.3:
+                word = rnd.choice(words)
+            else:
+                word = rnd.choices(stems, stem_weights)[0] + "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 4)))
+                words.append(word)
+            ops.append(("insert", word, rnd.choice((rnd.randint(1, 10), rnd.uniform(0.01, 100)))))
+        else:
+            source = rnd.choice(words) if words and rnd.random() < 0.8 else rnd.choice(stems)
+            prefix = source[:rnd.randint(0, len(source))]
+
+            if kind < 0.72:
+                ops.append(("remove", prefix))
+            else:
+                ops.append(("autocomplete", prefix, rnd.choice((None, 1, 3, 10))))
+
+    return ops
+
+
+def _check_autocomplete(name, got, reference, prefix, limit) -> str | None:
+    # Returns what's wrong with the results, None if they're fine
+    expected = {word: weight for word, weight in reference.items() if word.startswith(prefix)}
+
+    if len(got) != (len(expected) if limit is None else min(limit, len(expected))):
+        return f"{name}.autocomplete({prefix!r}, {limit}) returned {len(got)} results, expected {len(expected)} " \
+               f"(limit {limit})"
+
+    seen = set()
+    for word, weight in got:
+        if word not in expected:
+            return f"{name}.autocomplete({prefix!r}, {limit}) returned {word!r}, which it shouldn't have"
+        if word in seen:
+            return f"{name}.autocomplete({prefix!r}, {limit}) returned {word!r} twice"
+        if not isclose(weight, expected[word], rel_tol=1e-9, abs_tol=1e-9):
+            return f"{name}.autocomplete({prefix!r}, {limit}) gave {word!r} weight {weight}, expected {expected[word]}"
+        seen.add(word)
+
+    if any(got[i][1] < got[i + 1][1] for i in range(len(got) - 1)):
+        return f"{name}.autocomplete({prefix!r}, {limit}) isn't sorted by weight: {got}"
+
+    return None
+
+
+def run_workload(ops: list[tuple]) -> tuple[int, str] | None:
+    """Runs ops on every tree type and the reference. Returns (index of the operation, what went wrong) for the first
+    problem, or None if everything matched"""
+    trees = [tree_type() for tree_type in TREE_TYPES]
+    reference = {}  # word -> weight
+
+    for n, op in enumerate(ops):
+        try:
+            if op[0] == "insert":
+                _, word, weight = op
+                reference[word] = reference.get(word, 0) + weight
+                for tree in trees:
+                    tree.insert(word, weight, list(word))
+
+            elif op[0] == "remove":
+                prefix = op[1]
+                reference = {word: weight for word, weight in reference.items() if not word.startswith(prefix)}
+                for tree in trees:
+                    tree.remove(list(prefix))
+
+            else:
+                _, prefix, limit = op
+                for tree in trees:
+                    got = tree.autocomplete(list(prefix), limit) if limit is not None else tree.autocomplete(list(prefix))
+                    if problem := _check_autocomplete(type(tree).__name__, got, reference, prefix, limit):
+                        return n, problem
+
+            if (n + 1) % VERIFY_INTERVAL == 0 or n == len(ops) - 1:
+                verifier = TreeVerifier(list(reference.items()), max_errors=1)
+                for tree in trees:
+                    ok, problem = verifier.verify(tree)
+                    if not ok:
+                        return n, f"{type(tree).__name__}: {problem}"
+        except Exception as e:
+            return n, f"{type(e).__name__}: {e}"
+
+    return None
+
+
+def _split(items, n):
+    # n chunks that are as even as possible
+    size, extra = divmod(len(items), n)
+    chunks = []
+    start = 0
+
+    for i in range(n):
+        end = start + size + (i < extra)
+        chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
+def shrink_workload(ops: list[tuple]) -> list[tuple]:
+    """Delta debugs ops down to a workload that still fails, where taking out any one operation makes it pass"""
+    if (failure := run_workload(ops)) is None:
+        raise ValueError("The workload doesn't fail, there's nothing to shrink")
+
+    # Nothing after the failing operation matters
+    ops = ops[:failure[0] + 1]
+
+    n = 2
+    while len(ops) >= 2:
+        chunks = _split(ops, n)
+        complements = [[i for j, c in enumerate(chunks) if j != k for i in c] for k in range(n)]
+
+        for candidate in chunks + complements:
+            if candidate and (failure := run_workload(candidate)) is not None:
+                ops = candidate[:failure[0] + 1]
+                n = max(n - 1, 2)
+                break
+        else:
+            if n >= len(ops):
+                break
+            n = min(n * 2, len(ops))
+
+    return ops
+
+
+def _fuzz_one(seed, num_ops):
+    # Runs inside a worker process. Returns (seed, shrunk workload, what went wrong) if it fails
+    ops = generate_workload(seed, num_ops)
+    if run_workload(ops) is None:
+        return None
+
+    ops = shrink_workload(ops)
+    return seed, ops, run_workload(ops)[1]
+
+
+def fuzz(num_workloads: int = 100, first_seed: int = 0, num_ops: int = 5000, workers=None) -> list[tuple]:
+    """Runs num_workloads workloads (seeds first_seed, first_seed + 1, ...) over a process pool and prints every
+    failure. Returns the (seed, shrunk workload, what went wrong) of every one that failed"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fuzz_one, seed, num_ops) for seed in range(first_seed, first_seed + num_workloads)]
+        failures = [i for i in (f.result() for f in futures) if i is not None]
+
+    for seed, ops, problem in failures:
+        print(f"Seed {seed} failed: {problem}")
+        print(f"  shrunk to {len(ops)} operations: {ops}")
+
+    print(f"{num_workloads - len(failures)}/{num_workloads} workloads passed")
+    return failures
+
+
+if __name__ == "__main__":
+    fuzz(*(int(i) for i in sys.argv[1:3]))
@@ -1,38 +1,67 @@
 from a2_prefix_tree import SimplePrefixTree, CompressedPrefixTree
 
+from math import isclose
+from operator import eq
 
-def verify_simple_tree_structure(tree: SimplePrefixTree) -> tuple[bool, str | None]:
+
+def _extends(root, prefix) -> bool:
+    """Returns whether root is prefix plus one more item, without slicing root"""
+    return len(root) == len(prefix) + 1 and all(map(eq, root, prefix))
+
+
+def verify_simple_tree_structure(tree: SimplePrefixTree, max_errors: int = 10,
+                                 max_nodes: int | None = None) -> tuple[bool, str | None]:
     """Return `True` if tree is valid, otherwise `False`
 
     Checks to see if the tree structure is correct. We are NOT checking weights!
+
+    Every problem is reported (one per line), up to max_errors of them. With max_nodes, only that many nodes get
+    checked, so huge trees can be spot checked quickly. Memory only grows with the height of the tree.
     """
 
-    if tree.is_empty():
+    if tree.is_empty() or tree.is_leaf():
         return True, None
 
-    queue = [tree]
+    errors = []
+    checked = 1
 
-    while queue:
-        node = queue.pop()
+    if not tree.subtrees:
+        errors.append(f"Internal Node({tree.root}) has no subtrees")
 
+    # One iterator per level instead of a queue of every node that's waiting to be checked
+    stack = [(tree.root, iter(tree.subtrees))]
+
+    while stack and len(errors) < max_errors:
+        prefix, children = stack[-1]
+        node = next(children, None)
+
+        if node is None:
+            stack.pop()
+            continue
+
+        # Only out of budget if there's actually another node to check
+        if max_nodes is not None and checked >= max_nodes:
+            errors.append(f"Stopped after checking {checked} nodes")
+            return len(errors) == 1, "\n".join(errors)
+        checked += 1
         if node.is_leaf():  # Node is a leaf, we do not need to do anything else
             continue
 
+        if not _extends(node.root, prefix):
+            # Node's root isn't its parent's root plus one more character
+            kind = "length" if len(node.root) != len(prefix) + 1 else "prefix"
+            errors.append(f"Internal Node({prefix}) has a subtree with improper {kind}: {node.root}")
+
         if not node.subtrees:  # Node is not a leaf but has no subtrees (this is bad!)
-            return False, f"Internal Node({node.root}) has no subtrees"
-        elif bad_subt := [i for i in node.subtrees if not (i.is_leaf() or len(i.root) == len(node.root) + 1)]:
-            # Node has some subtrees that don't have a root with length + 1
-            return False, f"Internal Node({node.root}) has subtrees with improper lengths: {[i.root for i in bad_subt]}"
-        elif bad_subt := [i for i in node.subtrees if not (i.is_leaf() or i.root[:-1] == node.root)]:
-            return False, f"Internal Node({node.root}) has subtrees with improper prefix: {[i.root for i in bad_subt]}"
+            errors.append(f"Internal Node({node.root}) has no subtrees")
 
-        queue.extend(node.subtrees)
+        stack.append((node.root, iter(node.subtrees)))
 
-    return True, None
+    return not errors, "\n".join(errors[:max_errors]) or None
 
 
-def verify_tree_weights(tree: SimplePrefixTree | CompressedPrefixTree, inpt: list[str, int]) -> tuple[bool, str | None]:
-    """Returns whether or not tree weights are correct"""
+def _expected_weights(inpt: list[str, int]) -> dict[str, float]:
+    """Returns what every leaf's weight should be after inserting everything in inpt"""
     real_inpt = {}
     for i in inpt:
         if i[0] not in real_inpt:
@@ -40,6 +69,13 @@ def verify_tree_weights(tree: SimplePrefixTree | CompressedPrefixTree, inpt: lis
         else:
             real_inpt[i[0]] += i[1]
 
+    return real_inpt
+
+
+def verify_tree_weights(tree: SimplePrefixTree | CompressedPrefixTree, inpt: list[str, int]) -> tuple[bool, str | None]:
+    """Returns whether or not tree weights are correct"""
+    real_inpt = _expected_weights(inpt)
+
     queue = [tree]
 
     while queue:
@@ -56,6 +92,128 @@ def verify_tree_weights(tree: SimplePrefixTree | CompressedPrefixTree, inpt: lis
     return True, None
 
 
+class TreeVerifier:
+    """Checks the structure and weights of trees built from one list of insertions, in one walk over the tree
+
+    The expected leaf weights are worked out once, so the same verifier can check as many trees as needed (say a
+    SimplePrefixTree and a CompressedPrefixTree built from the same inpt). Internal weights are compared against the
+    sum of the expected leaf weights under them (not the weights the subtrees claim to have), and weights only have to
+    be within rel_tol/abs_tol of each other, so float sums done in a different order don't fail.
+
+    max_errors and max_nodes work like in verify_simple_tree_structure.
+    """
+
+    def __init__(self, inpt: list[str, int], max_errors: int = 10, max_nodes: int | None = None,
+                 rel_tol: float = 1e-9, abs_tol: float = 1e-9):
+        self.expected = _expected_weights(inpt)
+        self.max_errors = max_errors
+        self.max_nodes = max_nodes
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+
+    def _close(self, a, b) -> bool:
+        return a == b or isclose(a, b, rel_tol=self.rel_tol, abs_tol=self.abs_tol)
+
+    def verify(self, tree: SimplePrefixTree | CompressedPrefixTree) -> tuple[bool, str | None]:
+        """Return `True` if tree's structure and weights are valid, otherwise `False`
+
+        Compressed trees get the rules from verify_compressed_tree, simple trees the ones from
+        verify_simple_tree_structure.
+        """
+        return self._verify(tree, isinstance(tree, CompressedPrefixTree))
+
+    def _leaf_weight(self, node, errors) -> float:
+        # Returns what the leaf's weight should be, and adds an error if it isn't
+        if (expected := self.expected.get(node.root)) is None:
+            errors.append(f"Leaf({node.root}) was never inserted")
+            return node.weight
+
+        if not self._close(node.weight, expected):
+            errors.append(f"Leaf({node.root})'s weight is wrong; expected: {expected}, got: {node.weight}")
+        return expected
+
+    def _verify(self, tree, compressed: bool) -> tuple[bool, str | None]:
+        if tree.is_empty():
+            return True, None
+
+        errors = []
+        checked = 1
+
+        if tree.is_leaf():
+            self._leaf_weight(tree, errors)
+            return not errors, "\n".join(errors) or None
+
+        if not tree.subtrees:
+            errors.append(f"Internal Node({tree.root}) has no subtrees")
+
+        expected, close, max_nodes = self.expected, self._close, self.max_nodes
+
+        # [node, its subtrees left to check, the expected total weight of the ones checked so far, the characters its
+        # internal subtrees continue with (compressed trees only)]
+        stack = [[tree, iter(tree.subtrees), 0.0, set()]]
+
+        while stack and len(errors) < self.max_errors:
+            frame = stack[-1]
+            parent, children, total, branches = frame
+
+            # Leaves are handled right here, the loop only stops to go down into an internal subtree
+            for node in children:
+                if max_nodes is not None and checked >= max_nodes:
+                    errors.append(f"Stopped after checking {checked} nodes")
+                    return len(errors) == 1, "\n".join(errors)
+                checked += 1
+
+                if node.is_leaf():
+                    if (weight := expected.get(node.root)) is None or not close(node.weight, weight):
+                        weight = self._leaf_weight(node, errors)
+                    total += weight
+                    continue
+
+                prefix = parent.root
+                if not compressed:
+                    if not _extends(node.root, prefix):
+                        kind = "length" if len(node.root) != len(prefix) + 1 else "prefix"
+                        errors.append(f"Internal Node({prefix}) has a subtree with improper {kind}: {node.root}")
+                elif len(node.root) <= len(prefix) or not all(map(eq, node.root, prefix)):
+                    errors.append(f"Internal Node({prefix}) has a subtree with improper prefix: {node.root}")
+                elif (branch := node.root[len(prefix)]) in branches:
+                    errors.append(f"Internal Node({prefix}) has more than one subtree continuing with {branch!r}")
+                else:
+                    branches.add(branch)
+
+                if not node.subtrees:
+                    errors.append(f"Internal Node({node.root}) has no subtrees")
+                elif compressed and len(node.subtrees) == 1 and not node.subtrees[0].is_leaf():
+                    # A lone leaf is fine (the node is that value's whole prefix), a lone internal node isn't
+                    errors.append(f"Internal Node({node.root}) has only one subtree, it should have been compressed")
+
+                frame[2] = total
+                stack.append([node, iter(node.subtrees), 0.0, set()])
+                break
+            else:
+                # Post order: every subtree is done, so the expected total is complete and goes to the parent
+                stack.pop()
+                if not close(parent.weight, total):
+                    errors.append(f"Internal Node({parent.root})'s weight is wrong; expected: {total}, "
+                                  f"got: {parent.weight}")
+                if stack:
+                    stack[-1][2] += total
+
+        return not errors, "\n".join(errors[:self.max_errors]) or None
+
+
+def verify_compressed_tree(tree: CompressedPrefixTree, inpt: list[str, int], max_errors: int = 10,
+                           max_nodes: int | None = None) -> tuple[bool, str | None]:
+    """Return `True` if tree's structure AND weights are valid, otherwise `False`
+
+    An internal node (other than the root) can't have an internal node as its only subtree, since that one would have
+    been compressed into it. Having a leaf as its only subtree is fine, the node is then that value's whole prefix.
+    An internal subtree's root has to start with its parent's root and be longer, and no two internal subtrees can
+    continue with the same character (they would share a node). Weights are checked like in TreeVerifier.
+    """
+    return TreeVerifier(inpt, max_errors, max_nodes)._verify(tree, True)
+
+
 def main():
     t = SimplePrefixTree()
     inpt = [('trm', 9), ('fmi', 3), ('ijf', 6), ('nxu', 3), ('ddg', 2), ('mhk', 3), ('fac', 2), ('txt', 1), ('ruj', 1),
@@ -71,6 +229,9 @@ def main():
 
     print(verify_simple_tree_structure(t))
     print(verify_tree_weights(t, inpt))
+    # Same as both of the above, in one walk
+    print(TreeVerifier(inpt).verify(t))
 
 
-main()
+if __name__ == "__main__":
+    main()